@@ -0,0 +1,73 @@
+"""
+Structured logging for the API and the outbox worker.
+
+Every record is one JSON line on stdout (CloudWatch stores it as is and Logs Insights
+can query the fields). `LOG_LEVEL` (INFO) sets the threshold, `LOG_SAMPLE_RATE` (1.0)
+keeps only that share of the DEBUG/INFO records; warnings and errors are never dropped.
+
+Pass values as %-style args (`log.debug("loaded %d users", n)`) or as `extra` fields,
+never pre-formatted: a record below the level is discarded before anything is formatted.
+"""
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timezone
+
+ROOT_LOGGER = "api"
+
+# attributes every LogRecord has; anything else on a record came in through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps `rate` of the records below WARNING."""
+
+    def __init__(self, rate: float, rng: random.Random | None = None):
+        super().__init__()
+        self.rate = rate
+        self._random = rng or random.Random()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or self._random.random() < self.rate
+
+
+def configure_logging(level: str | None = None, sample_rate: float | None = None, stream=None) -> logging.Logger:
+    """(Re)configure the `api` logger tree; safe to call more than once."""
+    level = (level or os.environ.get("LOG_LEVEL") or "INFO").upper()
+    if sample_rate is None:
+        sample_rate = float(os.environ.get("LOG_SAMPLE_RATE") or 1.0)
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    # the Lambda runtime puts its own handler on the root logger; don't log twice
+    logger.propagate = False
+    return logger
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from applog import get_logger
+
+log = get_logger("cache")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def to_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class RosterSnapshot:
+    """Immutable view of Users_db at one cache version, indexed by employeeId and shift."""
+
+    def __init__(self, users: list, version: int):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.users = users
+        self.by_employee_id = {user.employeeId: user for user in users}
+        self.by_shift: dict[str, list] = {}
+        for user in users:
+            self.by_shift.setdefault(user.shift, []).append(user)
+
+
+class RosterCache:
+    """
+    Process-wide cache of the user roster, shared by every UserListDAL.
+
+    Writes through UserListDAL invalidate it by bumping the version. Other instances
+    (Lambda containers) learn about changes through the TTL or, where the cluster
+    supports it, a change stream (see `watch_roster_changes`).
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self._ttl_seconds = ttl_seconds
+        self._snapshot: Optional[RosterSnapshot] = None
+        self.version = 0
+        self.stats = CacheStats()
+
+    def get(self) -> Optional[RosterSnapshot]:
+        snapshot = self._snapshot
+        if snapshot is not None and self._ttl_seconds is not None \
+                and time.monotonic() - snapshot.loaded_at > self._ttl_seconds:
+            snapshot = self._snapshot = None
+        if snapshot is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return snapshot
+
+    def fill(self, users: list, version: int) -> RosterSnapshot:
+        snapshot = RosterSnapshot(users, version)
+        # an invalidation landed while the roster was loading, the result may be stale
+        if version == self.version:
+            self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        self.version += 1
+        self._snapshot = None
+        self.stats.invalidations += 1
+
+    def to_dict(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            **self.stats.to_dict(),
+            "version": self.version,
+            "size": len(snapshot.users) if snapshot else 0,
+            "ttlSeconds": self._ttl_seconds,
+        }
+
+
+class JobDocCache:
+    """
+    LRU/TTL cache of parsed JobDocument objects keyed by dateDocId.
+
+    Entries are validated once when loaded; JobsDAL applies its own writes to the
+    cached object (write-through) so the next read needs no round trip. Writes made
+    by other instances are picked up when the entry expires.
+    """
+
+    def __init__(self, max_entries: int = 32, ttl_seconds: Optional[float] = None):
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.generation = 0
+        self.stats = CacheStats()
+
+    def get(self, date_doc_id: str) -> Optional[Any]:
+        entry = self._entries.get(date_doc_id)
+        if entry is not None and self._ttl_seconds is not None \
+                and time.monotonic() - entry[0] > self._ttl_seconds:
+            del self._entries[date_doc_id]
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._entries.move_to_end(date_doc_id)
+        return entry[1]
+
+    def put(self, date_doc_id: str, job_doc: Any, generation: Optional[int] = None):
+        # a write landed while `job_doc` was loading, the loaded copy may be stale
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[date_doc_id] = (time.monotonic(), job_doc)
+        self._entries.move_to_end(date_doc_id)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def apply(self, date_doc_id: str, mutate: Callable[[Any], None], and_later: bool = False):
+        """Write-through: apply `mutate` to the cached doc (and, with `and_later`, every later one)."""
+        self.generation += 1
+        for key in self._keys(date_doc_id, and_later):
+            mutate(self._entries[key][1])
+
+    def evict(self, date_doc_id: str, and_later: bool = False):
+        self.generation += 1
+        for key in self._keys(date_doc_id, and_later):
+            del self._entries[key]
+            self.stats.invalidations += 1
+
+    def clear(self):
+        self.generation += 1
+        self.stats.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def _keys(self, date_doc_id: str, and_later: bool) -> list[str]:
+        if and_later:
+            # dateDocIds are ISO dates, so string order is date order
+            return [key for key in self._entries if key >= date_doc_id]
+        return [date_doc_id] if date_doc_id in self._entries else []
+
+    def to_dict(self) -> dict:
+        return {
+            **self.stats.to_dict(),
+            "size": len(self._entries),
+            "maxEntries": self._max_entries,
+            "ttlSeconds": self._ttl_seconds,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces identical reads that are in flight at the same time.
+
+    The first caller for a key runs the query; callers arriving with the same key before
+    it finishes await the same result (or exception) instead of issuing their own. The
+    result object is shared, so callers must not mutate it. Nothing is kept once the
+    query finishes: this collapses bursts, the caches above handle repeats.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[tuple, asyncio.Future] = {}
+        # operation -> [calls, executions]
+        self._counts: dict[str, list[int]] = {}
+
+    async def do(self, key: tuple, load: Callable[[], Any]) -> Any:
+        counts = self._counts.setdefault(key[0], [0, 0])
+        counts[0] += 1
+        future = self._in_flight.get(key)
+        if future is not None:
+            try:
+                # shielded: a follower that is cancelled must not cancel the leader's query
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the leader's request was cancelled (client gone), not ours: run the query after all
+                counts[0] -= 1
+                return await self.do(key, load)
+        counts[1] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # retrieved here so a burst of one does not log "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    def to_dict(self) -> dict:
+        return {
+            operation: {"calls": calls, "executions": executions, "coalesced": calls - executions}
+            for operation, (calls, executions) in sorted(self._counts.items())
+        }
+
+
+async def watch_roster_changes(user_collection: AsyncIOMotorCollection, roster_cache: RosterCache):
+    """Invalidate `roster_cache` on every write to the users collection (replica sets only)."""
+    while True:
+        try:
+            async with user_collection.watch() as stream:
+                async for _ in stream:
+                    roster_cache.invalidate()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.warning("roster change stream stopped: %s, retrying", e)
+            roster_cache.invalidate()
+            await asyncio.sleep(5)
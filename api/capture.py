@@ -0,0 +1,108 @@
+"""
+Request capture for local replay (bench/replay.py).
+
+With CAPTURE_ENABLED, `CaptureMiddleware` writes one JSON line per HTTP request:
+
+    {"ts": 1735711200.123, "method": "GET", "path": "/api/randomizer/morning",
+     "route": "GET /api/randomizer/{shift}", "query": "date_string=2025-01-01",
+     "contentType": null, "bodyBytes": 0, "status": 200, "durationMs": 41.2, "responseBytes": 1893}
+
+to CAPTURE_FILE (default `captures.jsonl`), or, with CAPTURE_FILE=log, as an `api.capture`
+log record so Lambda traffic lands in CloudWatch and can be exported from there.
+CAPTURE_SAMPLE_RATE keeps that share of requests. Request bodies (user data) are only
+kept with CAPTURE_BODIES, base64 encoded, up to CAPTURE_MAX_BODY_BYTES.
+"""
+import base64
+import json
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from applog import get_logger
+
+log = get_logger("capture")
+
+
+class CaptureSink:
+    """Appends lines to a file (line buffered, shared by every request of the process) or to the log."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None if path == "log" else open(path, "a", buffering=1)
+
+    def write(self, entry: dict):
+        if self._file is None:
+            log.info("capture", extra=entry)
+            return
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class CaptureMiddleware:
+    def __init__(self, app, sink: CaptureSink, route_name: Callable[[dict], str], sample_rate: float = 1.0,
+                 bodies: bool = False, max_body_bytes: int = 65536, rng: Optional[random.Random] = None):
+        self.app = app
+        self.sink = sink
+        self.route_name = route_name
+        self.sample_rate = sample_rate
+        self.bodies = bodies
+        self.max_body_bytes = max_body_bytes
+        self._random = rng or random.Random()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.sample_rate < 1.0 and self._random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+        ts = time.time()
+        started = time.perf_counter()
+        body = bytearray()
+        body_bytes = 0
+        status = 500
+        response_bytes = 0
+
+        async def receive_and_count():
+            nonlocal body_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_bytes += len(chunk)
+                if self.bodies and len(body) + len(chunk) <= self.max_body_bytes:
+                    body.extend(chunk)
+            return message
+
+        async def send_and_count(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_count, send_and_count)
+        finally:
+            headers = dict(scope.get("headers") or [])
+            content_type = headers.get(b"content-type")
+            entry = {
+                "ts": round(ts, 3),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": self.route_name(scope),
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "contentType": content_type.decode("latin-1") if content_type else None,
+                "bodyBytes": body_bytes,
+                "status": status,
+                "durationMs": round((time.perf_counter() - started) * 1000, 2),
+                "responseBytes": response_bytes,
+            }
+            # a truncated body would replay as a different request, so only whole ones are kept
+            if self.bodies and body_bytes and len(body) == body_bytes:
+                entry["body"] = base64.b64encode(bytes(body)).decode("ascii")
+            self.sink.write(entry)
@@ -1,9 +1,17 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, List
 from motor.motor_asyncio import AsyncIOMotorCollection
-import random
 
 from pydantic import BaseModel
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from applog import get_logger
+from cache import JobDocCache, RosterCache, RosterSnapshot, SingleFlight
+from history import SelectionHistoryDAL
+from rotation import DEFAULT_ROTATION, RotationEngine
+
+log = get_logger("dal")
 
 
 class EmailRequest(BaseModel):
@@ -18,6 +26,12 @@ class ShiftUpdateRequest(BaseModel):
     shift: str
 
 
+class ShiftBatchUpdateResult(BaseModel):
+    requested: int
+    matched: int
+    modified: int
+
+
 class UserRequest(BaseModel):
     employeeId: str
     name: str
@@ -38,7 +52,8 @@ class User(BaseModel):
 
     @staticmethod
     def from_doc(doc) -> "User":
-        return User(id=str(doc["_id"]),
+        # trusted: users are only written from validated requests, so skip re-validating on read
+        return User.model_construct(id=str(doc["_id"]),
                     designation=doc["designation"],
                     email=doc["email"],
                     phone=doc["phone"],
@@ -52,12 +67,11 @@ class UserNotFoundError(Exception):
 
 
 class UserListDAL:
-    def __init__(self, user_collection: AsyncIOMotorCollection):
-        print(user_collection.name)
+    def __init__(self, user_collection: AsyncIOMotorCollection, roster_cache: Optional[RosterCache] = None):
         self._user_collection = user_collection
+        self._roster_cache = roster_cache
 
-    async def get_user_list(self, session=None) -> list[User]:
-        print("we are here")
+    async def _load_user_list(self, session=None) -> list[User]:
         res = self._user_collection.find({}, {
             "_id": 1,
             "employeeId": 1,
@@ -66,30 +80,91 @@ class UserListDAL:
             "email": 1,
             "phone": 1,
             "shift": 1
-        })
+        }, session=session)
         user_list = []
         async for user in res:
-            print(user)
             user_list.append(User.from_doc(user))
-        # yield user_list
+        log.debug("loaded %d users from %s", len(user_list), self._user_collection.name)
         return user_list
 
+    async def get_roster(self, session=None) -> RosterSnapshot:
+        if self._roster_cache is None:
+            return RosterSnapshot(await self._load_user_list(session=session), version=0)
+        snapshot = self._roster_cache.get()
+        if snapshot is None:
+            version = self._roster_cache.version
+            snapshot = self._roster_cache.fill(await self._load_user_list(session=session), version)
+        return snapshot
+
+    def invalidate_roster_cache(self):
+        # called by every write path; callers that write inside a transaction call it again after commit
+        if self._roster_cache is not None:
+            self._roster_cache.invalidate()
+
+    async def get_user_list(self, session=None) -> list[User]:
+        return (await self.get_roster(session=session)).users
+
+    async def get_employee_ids(self, session=None) -> list[str]:
+        return list((await self.get_roster(session=session)).by_employee_id)
+
+    async def get_users_by_shift(self, shift: str, session=None) -> list[User]:
+        return (await self.get_roster(session=session)).by_shift.get(shift, [])
+
+    async def iter_users(self, fields: Optional[list[str]] = None, after: Optional[str] = None,
+                         limit: Optional[int] = None, session=None) -> AsyncIterator[dict]:
+        """
+        Users in employeeId order, yielded as the cursor produces them.
+
+        Keyset pagination: `after` is the last employeeId of the previous page. Only
+        `fields` (User field names, all by default) are fetched; employeeId always is.
+        """
+        fields = fields or list(User.model_fields)
+        projection = {"_id": int("id" in fields), "employeeId": 1}
+        projection.update((field, 1) for field in fields if field != "id")
+        query = {"employeeId": {"$gt": after}} if after is not None else {}
+        cursor = self._user_collection.find(query, projection, session=session).sort("employeeId", 1)
+        if limit:
+            cursor = cursor.limit(limit)
+        async for doc in cursor:
+            if "_id" in doc:
+                doc["id"] = str(doc.pop("_id"))
+            yield doc
+
     async def get_user_info(self, query_filter: dict, projection_filter: Optional[dict] = None):
-        print(f"query : {query_filter}, projection: {projection_filter}")
         users = self._user_collection.find(query_filter, projection_filter)
         ans = await users.to_list(length=None)
-        print(f"Ans: {ans}")
+        log.debug("user query %s matched %d document(s)", query_filter, len(ans))
         return ans
 
     async def update_user_shift(self, employeeId, shift, session=None):
-        print(f"we are inside patch {employeeId} , {shift}")
         res = self._user_collection.update_one(
             {"employeeId": employeeId},
-            {"$set": {"shift": shift}}
+            {"$set": {"shift": shift}},
+            session=session
         )
         response = await res
+        self.invalidate_roster_cache()
+        log.info("shift updated", extra={"employeeId": employeeId, "shift": shift})
         return str(response.acknowledged)
 
+    async def update_user_shifts(self, shifts: dict[str, str], session=None) -> ShiftBatchUpdateResult:
+        """Apply an employeeId -> shift mapping in one bulk_write: one UpdateMany per target shift."""
+        by_shift: dict[str, list[str]] = {}
+        for employee_id, shift in shifts.items():
+            by_shift.setdefault(shift, []).append(employee_id)
+        if not by_shift:
+            return ShiftBatchUpdateResult(requested=0, matched=0, modified=0)
+        res = await self._user_collection.bulk_write(
+            [UpdateMany({"employeeId": {"$in": employee_ids}}, {"$set": {"shift": shift}})
+             for shift, employee_ids in by_shift.items()],
+            ordered=False,
+            session=session
+        )
+        self.invalidate_roster_cache()
+        log.info("shifts updated", extra={"requested": len(shifts), "matched": res.matched_count,
+                                          "modified": res.modified_count})
+        return ShiftBatchUpdateResult(requested=len(shifts), matched=res.matched_count, modified=res.modified_count)
+
     async def create_user(self, user: UserRequest) -> User:
         res = self._user_collection.insert_one(
             {
@@ -102,9 +177,35 @@ class UserListDAL:
             }
         )
         response = await res
-        print(f"response => {response.inserted_id}")
+        self.invalidate_roster_cache()
+        log.info("user created", extra={"employeeId": user.employeeId, "insertedId": str(response.inserted_id)})
         return str(response.inserted_id)
     
+    async def bulk_upsert_users(self, users: list[UserRequest], session=None) -> list[dict]:
+        """
+        Upsert by employeeId in one unordered bulk_write. Returns one outcome per user, in
+        order: {"status": "created", "id"}, {"status": "updated"} or {"status": "failed", "error"}.
+        """
+        if not users:
+            return []
+        operations = [UpdateOne({"employeeId": user.employeeId}, {"$set": user.model_dump()}, upsert=True)
+                      for user in users]
+        outcomes = [{"status": "updated"} for _ in users]
+        try:
+            res = await self._user_collection.bulk_write(operations, ordered=False, session=session)
+            upserted = res.upserted_ids
+        except BulkWriteError as e:
+            # unordered: everything but the failed operations went through
+            upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+            for error in e.details.get("writeErrors", []):
+                outcomes[error["index"]] = {"status": "failed", "error": error["errmsg"]}
+        finally:
+            self.invalidate_roster_cache()
+        for index, inserted_id in upserted.items():
+            outcomes[index] = {"status": "created", "id": str(inserted_id)}
+        log.info("users imported", extra={"users": len(users), "inserted": len(upserted)})
+        return outcomes
+
     async def update_user(self, user_id: str, user: UserRequest) -> bool:
         res = await self._user_collection.update_one(
             {"employeeId": user_id},
@@ -118,13 +219,15 @@ class UserListDAL:
                 }
             }
         )
+        self.invalidate_roster_cache()
         if res.matched_count == 0:
             raise UserNotFoundError(f"User with id {user_id} not found")
         return res.modified_count > 0
 
     async def delete_user_by_email(self, email, session=None):
-        res = self._user_collection.delete_one({"email": email})
+        res = self._user_collection.delete_one({"email": email}, session=session)
         response = await res
+        self.invalidate_roster_cache()
         return str(response.deleted_count)
 
 
@@ -134,7 +237,7 @@ class JobUserItem(BaseModel):
 
     @staticmethod
     def from_doc(doc) -> "JobUserItem":
-        return JobUserItem(
+        return JobUserItem.model_construct(
             status=doc['status'],
             userid=doc['userid']
         )
@@ -162,7 +265,8 @@ class EmployeeByShiftResponse(BaseModel):
 
     @staticmethod
     def from_doc(doc) -> "EmployeeByShiftResponse":
-        return EmployeeByShiftResponse(
+        # trusted, like User.from_doc
+        return EmployeeByShiftResponse.model_construct(
             employeeId=doc["users"]["userid"],
             name=doc["userDetails"]["name"],
             designation=doc["userDetails"]["designation"],
@@ -178,16 +282,13 @@ class RandomizerResponse1(BaseModel):
 
     @staticmethod
     def from_doc(doc) -> "RandomizerResponse1":
-        main_list: List[EmployeeByShiftResponse] = [
-            EmployeeByShiftResponse.from_doc(item) for item in doc["mainList"]
-        ]
+        # items may be raw roster rows or models already built from them; the latter are kept as they are
+        def as_model(item) -> EmployeeByShiftResponse:
+            return item if isinstance(item, EmployeeByShiftResponse) else EmployeeByShiftResponse.from_doc(item)
 
-        standby_list: List[EmployeeByShiftResponse] = [
-            EmployeeByShiftResponse.from_doc(item) for item in doc["standbyList"]
-        ]
-        return RandomizerResponse1(
-            mainList=main_list,
-            standbyList=standby_list
+        return RandomizerResponse1.model_construct(
+            mainList=[as_model(item) for item in doc["mainList"]],
+            standbyList=[as_model(item) for item in doc["standbyList"]]
         )
 
 
@@ -202,6 +303,9 @@ class RandomizerLogItem(BaseModel):
     shiftTiming: Optional[str] = None
     category: Optional[str] = None
     randomizerResult: RandomizerResponse1
+    # audit trail of the draw, see randomizer.replay
+    seed: Optional[int] = None
+    sampling: Optional[dict] = None
 
 class JobDocumentRequest(BaseModel):
    dateDocId: str
@@ -211,6 +315,11 @@ class JobDocumentRequest(BaseModel):
    prevDocId: str
    randomizerLog: list[RandomizerLogItem]
 
+class JobDocBatchResult(BaseModel):
+    created: list[str]
+    existing: list[str]
+
+
 class JobDocument(BaseModel):
     id: str
     dateDocId: str
@@ -223,7 +332,6 @@ class JobDocument(BaseModel):
 
     @staticmethod
     def from_doc(doc) -> "JobDocument":
-        print(f"doc -> {doc}")
         return JobDocument(
             id=str(doc["_id"]),
             shiftDetail=doc["shiftDetail"],
@@ -236,83 +344,250 @@ class JobDocument(BaseModel):
 
 
 
-class JobsDAL:
-    def __init__(self, jobs_collection: AsyncIOMotorCollection):
-        self._jobs_collection = jobs_collection
+# item models of the job-doc arrays that push_to_job_doc can mirror into the cache
+_JOB_DOC_ARRAY_ITEMS = {"users": JobUserItem, "randomizerLog": RandomizerLogItem}
 
-    async def get_job_doc(self, date_str: str, session=None) -> JobDocument:
-        print("we are here")
-        res = await self._jobs_collection.find_one({"dateDocId": date_str})
-        return JobDocument.from_doc(res)
+# user fields copied into each `users` entry of a job doc with JobsDAL(embed_roster=True)
+ROSTER_SNAPSHOT_FIELDS = ("name", "designation", "email", "phone", "shift")
+# snapshot entries stay grouped by shift, in employeeId order within a shift
+_ROSTER_SNAPSHOT_ORDER = {"shift": 1, "userid": 1}
 
-    def populate_daily_shift(date_today: datetime):
-        return None
 
-    async def create_job_doc(self, date_str: datetime, employee_ids: list[str], session=None) -> JobDocument:
-        document = await self._jobs_collection.find_one({"dateDocId": date_str.strftime("%Y-%m-%d")})
+class JobsDAL:
+    def __init__(self, jobs_collection: AsyncIOMotorCollection, user_collection_name: str = "Users_db",
+                 randomizer_log_cap: Optional[int] = None, job_doc_cache: Optional[JobDocCache] = None,
+                 rotation: RotationEngine = DEFAULT_ROTATION, history: Optional[SelectionHistoryDAL] = None,
+                 single_flight: Optional[SingleFlight] = None, embed_roster: bool = False):
+        self._jobs_collection = jobs_collection
+        self._user_collection_name = user_collection_name
+        # keep only the latest N randomizer runs per day (None = unbounded)
+        self._randomizer_log_cap = randomizer_log_cap
+        self._job_doc_cache = job_doc_cache
+        self._rotation = rotation
+        self._history = history
+        # process-wide, so concurrent requests for the same date share one query
+        self._single_flight = single_flight
+        # new job docs carry a roster snapshot per user, so shift queries need no $lookup
+        self._embed_roster = embed_roster
+
+    async def _coalesced(self, key: tuple, load: Callable[[], Awaitable[Any]], session=None) -> Any:
+        # reads inside a session see the session's own writes, so they are never shared
+        if self._single_flight is None or session is not None:
+            return await load()
+        return await self._single_flight.do(key, load)
+
+    async def _find_job_doc(self, date_str: str, session=None) -> Optional[JobDocument]:
+        # reads inside a session must see the session's own writes, so they skip the cache
+        use_cache = self._job_doc_cache is not None and session is None
+        if use_cache:
+            job_doc = self._job_doc_cache.get(date_str)
+            if job_doc is not None:
+                return job_doc
+
+        async def load() -> Optional[JobDocument]:
+            # only the query that actually ran caches its result, against the generation it started at
+            generation = self._job_doc_cache.generation if use_cache else None
+            res = await self._jobs_collection.find_one({"dateDocId": date_str}, session=session)
+            if res is None:
+                return None
+            job_doc = JobDocument.from_doc(res)
+            if use_cache:
+                self._job_doc_cache.put(date_str, job_doc, generation)
+            return job_doc
+
+        return await self._coalesced(("job_doc", date_str), load, session)
+
+    def _write_through(self, date_str: str, mutate: Callable[[JobDocument], None], session=None,
+                       and_later: bool = False):
+        if self._job_doc_cache is None:
+            return
+        if session is not None:
+            # the surrounding transaction may still abort, drop the entry instead
+            self._job_doc_cache.evict(date_str, and_later=and_later)
+        else:
+            self._job_doc_cache.apply(date_str, mutate, and_later=and_later)
+
+    async def get_job_doc(self, date_str: str, session=None) -> Optional[JobDocument]:
+        return await self._find_job_doc(date_str, session=session)
+
+    async def create_job_doc(self, date_str: datetime, employee_ids: list[str], session=None,
+                             roster: Optional[list] = None) -> JobDocument:
+        date_doc_id = date_str.strftime("%Y-%m-%d")
+        document = self._job_doc_cache.get(date_doc_id) if self._job_doc_cache is not None else None
+        if document is None:
+            document = await self._jobs_collection.find_one({"dateDocId": date_doc_id}, {"_id": 1}, session=session)
 
         if document:
             return {"msg": "doc already exists"}
-        
-        print(f"we are here-> date : {date_str} \n employee_ids {employee_ids}")
-        userItems = [JobUserItem(status=True, userid=e) for e in employee_ids]
-        print(f"user items: {userItems}")
-        # create the job Doc
-        shift_detail = ShiftDetail()
-
-        self.populate_shifts(date_str, shift_detail) 
-        jobdoc = JobDocumentRequest(users=userItems, shiftDetail=shift_detail, createdOn=datetime.now(),
-                                    dateDocId=date_str.strftime("%Y-%m-%d"), prevDocId="", randomizerLog=[])
-        print(f"jobDoc: {jobdoc}")
-
-        # get all employee ids
-        res = await self._jobs_collection.insert_one(jobdoc.model_dump())
+
+        snapshots = await self._roster_snapshots(employee_ids, roster, session=session)
+        jobdoc = self._new_job_doc(date_str, employee_ids, snapshots)
+        res = await self._jobs_collection.insert_one(self._job_doc_record(jobdoc, snapshots), session=session)
+        log.info("job doc created", extra={"dateDocId": date_doc_id, "users": len(jobdoc.users)})
+        if self._job_doc_cache is not None and session is None:
+            self._job_doc_cache.put(date_doc_id, JobDocument.model_construct(id=str(res.inserted_id), **dict(jobdoc)))
         return {"inserted_id": str(res.inserted_id)}
 
-    def populate_shifts(self, date_str, shift_detail):
-        days_passed_since_bigbang = (date_str - datetime(2025, 1, 1)).days
-        print(f"kitne din ho gye {days_passed_since_bigbang}")
-        shift_info_morning = ['echo', 'alpha', 'bravo', 'charlie', 'delta']
-        shift_info_afternoon = ['delta','echo', 'alpha', 'bravo', 'charlie']
-        shift_info_night = ['charlie','delta','echo','alpha', 'bravo']
-        current_index = days_passed_since_bigbang%5  
-        shift_detail.morning = shift_info_morning[current_index]
-        shift_detail.afternoon = shift_info_afternoon[current_index]
-        shift_detail.night = shift_info_night[current_index]
-        if date_str.weekday() != 5 or date_str.weekday() != 6:
-            shift_detail.general = "general"
-            shift_detail.ramc = "ramc"
-
-    async def add_user_to_current_job_doc(self, date_str: str, employee_id: str, session=None):
-        print(f"date str : {date_str}")
-        query = self._jobs_collection.aggregate([
-            {
-                '$match': {
-                    'dateDocId': date_str
-                }
-            }, {
-                '$set': {
-                    'users': {
-                        '$concatArrays': [
-                            '$users', [
-                                {
-                                    'userid': employee_id,
-                                    'status': False
-                                }
-                            ]
-                        ]
-                    }
-                }
-            },
-            {
-                '$merge': {
-                    'into': 'daily_jobs',
-                    'whenMatched': 'merge'
-                }
-            }
-        ])
-        await query.to_list(length=None)
+    def _new_job_doc(self, date: datetime, employee_ids: list[str],
+                     snapshots: Optional[dict[str, dict]] = None) -> JobDocumentRequest:
+        if snapshots is not None:
+            employee_ids = sorted(employee_ids, key=lambda e: (snapshots.get(e, {}).get("shift", ""), e))
+        return JobDocumentRequest(users=[JobUserItem.model_construct(status=True, userid=e) for e in employee_ids],
+                                  shiftDetail=ShiftDetail(**self._rotation.teams_on(date)), createdOn=datetime.now(),
+                                  dateDocId=date.strftime("%Y-%m-%d"), prevDocId="", randomizerLog=[])
 
+    @staticmethod
+    def _job_doc_record(jobdoc: JobDocumentRequest, snapshots: Optional[dict[str, dict]]) -> dict:
+        record = jobdoc.model_dump()
+        if snapshots is not None:
+            for user in record["users"]:
+                user.update(snapshots.get(user["userid"], {}))
+            record["rosterSnapshot"] = True
+        return record
+
+    async def _roster_snapshots(self, employee_ids: list[str], roster: Optional[list] = None,
+                                session=None) -> Optional[dict[str, dict]]:
+        """
+        employeeId -> snapshot fields for new `users` entries, None when embedding is off.
+        Taken from `roster` (User/UserRequest objects) when given, else read from the users collection.
+        """
+        if not self._embed_roster:
+            return None
+        if roster is not None:
+            return {user.employeeId: {field: getattr(user, field) for field in ROSTER_SNAPSHOT_FIELDS}
+                    for user in roster}
+        projection = {"_id": 0, "employeeId": 1, **{field: 1 for field in ROSTER_SNAPSHOT_FIELDS}}
+        users = self._jobs_collection.database.get_collection(self._user_collection_name)
+        return {doc.pop("employeeId"): doc async for doc in users.find(
+            {"employeeId": {"$in": employee_ids}}, projection, session=session)}
+
+    async def create_job_docs(self, dates: list[datetime], employee_ids: list[str], session=None,
+                              roster: Optional[list] = None) -> JobDocBatchResult:
+        """
+        Create the job docs for `dates` that do not exist yet in one unordered insert_many.
+        A doc another instance created meanwhile (duplicate dateDocId) counts as existing.
+        """
+        date_doc_ids = [date.strftime("%Y-%m-%d") for date in dates]
+        existing = {doc["dateDocId"] async for doc in self._jobs_collection.find(
+            {"dateDocId": {"$in": date_doc_ids}}, {"_id": 0, "dateDocId": 1}, session=session)}
+        missing = [date for date, date_doc_id in zip(dates, date_doc_ids) if date_doc_id not in existing]
+        snapshots = await self._roster_snapshots(employee_ids, roster, session=session) if missing else None
+        new_docs = [self._job_doc_record(self._new_job_doc(date, employee_ids, snapshots), snapshots)
+                    for date in missing]
+        lost = set()
+        if new_docs:
+            try:
+                await self._jobs_collection.insert_many(new_docs, ordered=False, session=session)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(error["code"] != 11000 for error in errors):
+                    raise
+                lost = {new_docs[error["index"]]["dateDocId"] for error in errors}
+        created = [doc["dateDocId"] for doc in new_docs if doc["dateDocId"] not in lost]
+        log.info("job docs created", extra={"dates": created, "users": len(employee_ids)})
+        return JobDocBatchResult(created=created, existing=sorted(existing | lost))
+
+    async def push_to_job_doc(self, date_str: str, field: str, items: list[dict], slice: Optional[int] = None,
+                              session=None, guard: Optional[dict] = None,
+                              add_to_set: Optional[dict[str, list]] = None) -> int:
+        """
+        Append `items` to the `field` array of a job doc in place with $push/$each.
+
+        Only the new elements are written (no read-modify-write of the whole doc),
+        concurrent appends cannot overwrite each other and the write joins `session`.
+        A negative `slice` keeps the last -slice elements, a positive one the first.
+        `guard` is an extra filter on the doc; when it does not match nothing is written.
+        `add_to_set` (field -> values) adds values to other, uncached arrays in the same update.
+        """
+        push = {"$each": items}
+        if slice is not None:
+            push["$slice"] = slice
+        update = {"$push": {field: push}}
+        if add_to_set:
+            update["$addToSet"] = {name: {"$each": values} for name, values in add_to_set.items()}
+        res = await self._jobs_collection.update_one(
+            {"dateDocId": date_str, **(guard or {})},
+            update,
+            session=session
+        )
+        if guard is not None and not res.modified_count:
+            return 0
+
+        item_model = _JOB_DOC_ARRAY_ITEMS.get(field)
+        if item_model is None:
+            if self._job_doc_cache is not None:
+                self._job_doc_cache.evict(date_str)
+        else:
+            def append(job_doc: JobDocument):
+                array = getattr(job_doc, field)
+                array.extend(item_model.model_validate(item) for item in items)
+                if slice is not None:
+                    array[:] = array[slice:] if slice < 0 else array[:slice]
+            self._write_through(date_str, append, session=session)
+        return res.modified_count
+
+    async def add_user_to_current_job_doc(self, date_str: str, employee_id: str, session=None,
+                                          roster: Optional[list] = None):
+        await self.add_users_to_job_docs(date_str, [employee_id], session=session, roster=roster)
+
+    async def add_users_to_job_docs(self, date_str: str, employee_ids: list[str], session=None,
+                                    roster: Optional[list] = None):
+        """Add users to the job doc of `date_str` and to every pre-generated one after it, in one $push."""
+        if not employee_ids:
+            return
+        items = [{'userid': employee_id, 'status': False} for employee_id in employee_ids]
+        snapshots = await self._roster_snapshots(employee_ids, roster, session=session)
+        if snapshots is None:
+            await self._jobs_collection.update_many(
+                {"dateDocId": {"$gte": date_str}},
+                {"$push": {"users": {"$each": items}}},
+                session=session
+            )
+        else:
+            # docs with a snapshot get the users' details, sorted into their shift's group
+            snapshot_items = [{**item, **snapshots.get(item["userid"], {})} for item in items]
+            await self._jobs_collection.bulk_write([
+                UpdateMany({"dateDocId": {"$gte": date_str}, "rosterSnapshot": True},
+                           {"$push": {"users": {"$each": snapshot_items, "$sort": _ROSTER_SNAPSHOT_ORDER}}}),
+                UpdateMany({"dateDocId": {"$gte": date_str}, "rosterSnapshot": {"$ne": True}},
+                           {"$push": {"users": {"$each": items}}}),
+            ], ordered=False, session=session)
+
+        def append(job_doc: JobDocument):
+            job_doc.users.extend(JobUserItem.model_construct(**item) for item in items)
+        self._write_through(date_str, append, session=session, and_later=True)
+
+    async def refresh_roster_snapshots(self, date_str: str, changes: dict[str, dict], session=None) -> int:
+        """
+        Copy user edits (employeeId -> changed fields) into the roster snapshots of the job doc of
+        `date_str` and every later one, in one bulk write; earlier docs keep the roster of their day.
+        The job doc cache holds no snapshot fields, so there is nothing to write through.
+        """
+        if not self._embed_roster:
+            return 0
+        # one array filter per distinct change, e.g. per target shift of a batch shift update
+        groups: dict[tuple, list[str]] = {}
+        for employee_id, fields in changes.items():
+            snapshot = tuple(sorted((field, value) for field, value in fields.items()
+                                    if field in ROSTER_SNAPSHOT_FIELDS))
+            if snapshot:
+                groups.setdefault(snapshot, []).append(employee_id)
+        if not groups:
+            return 0
+        set_fields, array_filters = {}, []
+        for index, (snapshot, employee_ids) in enumerate(groups.items()):
+            for field, value in snapshot:
+                set_fields[f"users.$[u{index}].{field}"] = value
+            array_filters.append({f"u{index}.userid": {"$in": employee_ids}})
+        docs = {"dateDocId": {"$gte": date_str}, "rosterSnapshot": True}
+        requests = [UpdateMany(docs, {"$set": set_fields}, array_filters=array_filters)]
+        if any(field == "shift" for snapshot in groups for field, _ in snapshot):
+            # moved users go back into their new shift's group
+            requests.append(UpdateMany(docs, {"$push": {"users": {"$each": [], "$sort": _ROSTER_SNAPSHOT_ORDER}}}))
+        res = await self._jobs_collection.bulk_write(requests, session=session)
+        log.info("roster snapshots refreshed", extra={"from": date_str, "users": len(changes),
+                                                       "modified": res.modified_count})
+        return res.modified_count
 
     async def update_user_status(self, date_str: str, user_update_request: list[JobUserItem], session=None):
         # create set and array filter to update
@@ -325,7 +600,14 @@ class JobsDAL:
             array_filter_list.append({f"{tmp}.userid": user.userid})
 
         res = await self._jobs_collection.update_one(filter={"dateDocId": date_str}, update={"$set": set_dict},
-                                                     array_filters=array_filter_list)
+                                                     array_filters=array_filter_list, session=session)
+
+        statuses = {user.userid: user.status for user in user_update_request}
+        def set_statuses(job_doc: JobDocument):
+            for user in job_doc.users:
+                if user.userid in statuses:
+                    user.status = statuses[user.userid]
+        self._write_through(date_str, set_statuses, session=session)
         return {"updated_id": str(res.modified_count)}
         # res = await self._jobs_collection.find_one({"dateDocId": date_str})
 
@@ -333,15 +615,60 @@ class JobsDAL:
         set_dict = {}
         for shift in shift_detail:
             set_dict[f"shiftDetail.{shift[0]}"] = shift[1]
-        res = await self._jobs_collection.update_one(filter={"dateDocId": date_str}, update={"$set": set_dict})
+        res = await self._jobs_collection.update_one(filter={"dateDocId": date_str}, update={"$set": set_dict},
+                                                     session=session)
+
+        def set_shift_detail(job_doc: JobDocument):
+            for name, team in shift_detail:
+                setattr(job_doc.shiftDetail, name, team)
+        self._write_through(date_str, set_shift_detail, session=session)
         return {"updated_id": str(res.modified_count)}
 
-    async def get_shift_details_from_job_doc(self, date_str: str, session=None):
-        res = await self._jobs_collection.find_one({"dateDocId": date_str})
-        return res["shiftDetail"]
+    def _snapshot_pipeline(self, date_str: str, team: str, fields=ROSTER_SNAPSHOT_FIELDS, after: Optional[str] = None,
+                           limit: Optional[int] = None, extra: Optional[dict] = None) -> list[dict]:
+        """
+        Active users of `team` (a team name, or a $-path into the job doc) read from the doc's roster
+        snapshot: the indexed dateDocId match and a $filter over that one doc's `users`, no $lookup.
+        Snapshot entries are kept sorted by (shift, userid), so the rows come in employeeId order.
+        Rows have the `get_active_users_id_by_shift` shape; `rosterSnapshot` tells the caller
+        whether the doc has a snapshot at all.
+        """
+        cond = ["$$this.status", {"$eq": ["$$this.shift", team]}]
+        if after is not None:
+            cond.append({"$gt": ["$$this.userid", after]})
+        rows = {"$filter": {"input": "$users", "cond": {"$and": cond}}}
+        if limit:
+            rows = {"$slice": [rows, limit]}
+        return [
+            {"$match": {"dateDocId": date_str}},
+            {"$project": {
+                "_id": 0,
+                "rosterSnapshot": 1,
+                **(extra or {}),
+                "roster": {"$map": {"input": rows, "in": {
+                    "users": {"userid": "$$this.userid"},
+                    "userDetails": {field: f"$$this.{field}" for field in fields},
+                }}},
+            }},
+        ]
 
+    async def _snapshot_roster(self, pipeline: list[dict], session=None) -> tuple[bool, Optional[dict]]:
+        """(found, doc): found is False when the $lookup pipelines must answer instead."""
+        if not self._embed_roster:
+            return False, None
+        res = await self._jobs_collection.aggregate(pipeline, session=session).to_list(length=1)
+        if not res:
+            return True, None
+        return bool(res[0].get("rosterSnapshot")), res[0]
 
     async def get_active_users_id_by_shift(self, date_str: str, shift: str, session=None):
+        return await self._coalesced(("active_users_by_shift", date_str, shift),
+                                     lambda: self._load_active_users_by_shift(date_str, shift, session), session)
+
+    async def _load_active_users_by_shift(self, date_str: str, shift: str, session=None) -> list[dict]:
+        found, doc = await self._snapshot_roster(self._snapshot_pipeline(date_str, shift), session=session)
+        if found:
+            return doc["roster"] if doc is not None else []
         query = self._jobs_collection.aggregate(
             [
                 {
@@ -356,7 +683,7 @@ class JobsDAL:
                 }
             }, {
                 '$lookup': {
-                    'from': 'Users_db',
+                    'from': self._user_collection_name,
                     'localField': 'users.userid',
                     'foreignField': 'employeeId',
                     'as': 'userDetails'
@@ -378,56 +705,295 @@ class JobsDAL:
                     'users.userid': 1
                 }
             }
-            ]
+            ],
+            session=session
         )
-        res = await query.to_list(length=None)
-        return res
-
-
-    async def update_randomizer_run_in_job_doc(self, response: RandomizerResponse1,date_str: str,team: str,shift: str, session=None):
-        print(f"response : {response}")
-        hh = response.model_dump()
-        print(f"hh : {hh}")
-        print(f"date_str: {date_str}")
+        return await query.to_list(length=None)
+
+
+    async def iter_active_users_by_shift(self, date_str: str, shift: str, fields: Optional[list[str]] = None,
+                                         after: Optional[str] = None, limit: Optional[int] = None,
+                                         session=None) -> AsyncIterator[dict]:
+        """
+        Flat EmployeeByShiftResponse documents in employeeId order, streamed off the aggregation
+        cursor, with the same keyset pagination and field selection as UserListDAL.iter_users.
+        """
+        fields = fields or list(EmployeeByShiftResponse.model_fields)
+        found, doc = await self._snapshot_roster(self._snapshot_pipeline(
+            date_str, shift, [field for field in fields if field != "employeeId"], after, limit), session=session)
+        if found:
+            for row in doc["roster"] if doc is not None else []:
+                yield {"employeeId": row["users"]["userid"], **row["userDetails"]}
+            return
+        active = {"users.status": True}
+        if after is not None:
+            active["users.userid"] = {"$gt": after}
         pipeline = [
+            {"$match": {"dateDocId": date_str}},
+            {"$unwind": "$users"},
+            {"$match": active},
+            {"$sort": {"users.userid": 1}},
+            {"$lookup": {"from": self._user_collection_name, "localField": "users.userid",
+                         "foreignField": "employeeId", "as": "userDetails"}},
+            {"$unwind": "$userDetails"},
+            {"$match": {"userDetails.shift": shift}},
+        ]
+        if limit:
+            pipeline.append({"$limit": limit})
+        projection = {"_id": 0, "employeeId": "$users.userid"}
+        projection.update((field, f"$userDetails.{field}") for field in fields if field != "employeeId")
+        pipeline.append({"$project": projection})
+        async for doc in self._jobs_collection.aggregate(pipeline, session=session):
+            yield doc
+
+    async def get_shift_roster(self, date_str: str, shift: str, session=None) -> Optional[dict]:
+        """
+        Resolve the team allotted to `shift` and its active roster in one round trip.
+
+        Only the allotted team and the matching users leave the server, so the cost
+        follows the shift size instead of the job document (users + randomizerLog).
+        Roster rows have the same shape as `get_active_users_id_by_shift` rows.
+        Returns None when there is no job doc for the date.
+        """
+        return await self._coalesced(("shift_roster", date_str, shift),
+                                     lambda: self._load_shift_roster(date_str, shift, session), session)
+
+    async def _load_shift_roster(self, date_str: str, shift: str, session=None) -> Optional[dict]:
+        allotted_team = f"$shiftDetail.{shift}"
+        found, doc = await self._snapshot_roster(
+            self._snapshot_pipeline(date_str, allotted_team, extra={"allottedTeam": allotted_team}), session=session)
+        if found:
+            return doc
+        query = self._jobs_collection.aggregate(
+            [
                 {
                     '$match': {
                         'dateDocId': date_str
                     }
                 }, {
-                    '$set': {
-                        'randomizerLog': {
-                            '$concatArrays': [
-                                '$randomizerLog', [
-                                    {
-                                        'triggerDateTime': datetime.now(),
-                                        'shift': shift,
-                                        'allotedTeam': team,
-                                        'randomizerResult': hh
-                                    }
-                                ]
-                            ]
+                '$project': {
+                    '_id': 0,
+                    'allottedTeam': f'$shiftDetail.{shift}',
+                    'activeIds': {
+                        '$map': {
+                            'input': {'$filter': {'input': '$users', 'cond': '$$this.status'}},
+                            'in': '$$this.userid'
                         }
                     }
-                }, {
-                    '$merge': {
-                        'into': 'daily_jobs',
-                        'whenMatched': 'merge'
+                }
+            }, {
+                '$lookup': {
+                    'from': self._user_collection_name,
+                    'localField': 'activeIds',
+                    'foreignField': 'employeeId',
+                    'as': 'activeUsers'
+                }
+            }, {
+                '$project': {
+                    'allottedTeam': 1,
+                    'roster': {
+                        '$map': {
+                            'input': {
+                                '$filter': {
+                                    'input': '$activeUsers',
+                                    'cond': {'$eq': ['$$this.shift', '$allottedTeam']}
+                                }
+                            },
+                            'in': {
+                                'users': {'userid': '$$this.employeeId'},
+                                'userDetails': {
+                                    'name': '$$this.name',
+                                    'designation': '$$this.designation',
+                                    'email': '$$this.email',
+                                    'phone': '$$this.phone',
+                                    'shift': '$$this.shift'
+                                }
+                            }
+                        }
                     }
                 }
-            ]
+            }
+            ],
+            session=session
+        )
+        res = await query.to_list(length=1)
+        return res[0] if res else None
+
+    @staticmethod
+    def build_randomizer_log_item(response: RandomizerResponse1, team: str, shift: str, seed: Optional[int] = None,
+                                  sampling: Optional[dict] = None) -> dict:
+        return {
+            'triggerDateTime': datetime.now(),
+            'shift': shift,
+            'allotedTeam': team,
+            'randomizerResult': response.model_dump(),
+            'seed': seed,
+            'sampling': sampling
+        }
+
+    async def append_randomizer_logs(self, date_str: str, log_items: list[dict], session=None,
+                                     outbox_ids: Optional[list[str]] = None):
+        """
+        Append runs to the day's randomizerLog in place (the job doc is neither read back nor
+        rewritten) and fold them into the selection history.
+
+        Runs replayed from the outbox pass their item ids as `outbox_ids` (one per entry). The
+        outbox delivers at least once, so the ids are added to the doc's `deliveredOutboxIds`
+        in the same update, entries whose id is already there are skipped and the $push is
+        guarded against a worker that raced us to the same ids. That set is not capped like
+        randomizerLog, so a run the cap already dropped is not appended again either. History
+        recording is idempotent and runs for every entry, so a retry after a failed history
+        write completes it.
+        """
+        new_items, new_ids = log_items, outbox_ids or []
+        if new_ids:
+            delivered = await self._delivered_outbox_ids(date_str, new_ids, session=session)
+            kept = [(item, outbox_id) for item, outbox_id in zip(log_items, new_ids) if outbox_id not in delivered]
+            new_items, new_ids = [item for item, _ in kept], [outbox_id for _, outbox_id in kept]
+        if new_items:
+            cap = -self._randomizer_log_cap if self._randomizer_log_cap else None
+            guard = {"deliveredOutboxIds": {"$nin": new_ids}} if new_ids else None
+            add_to_set = {"deliveredOutboxIds": new_ids} if new_ids else None
+            await self.push_to_job_doc(date_str, "randomizerLog", new_items, slice=cap, session=session, guard=guard,
+                                       add_to_set=add_to_set)
+        if self._history is not None:
+            await self._history.record(date_str, log_items, session=session)
+        log.info("randomizer log appended", extra={"dateDocId": date_str, "entries": len(new_items),
+                                                   "replayed": len(log_items) - len(new_items)})
+
+    async def _delivered_outbox_ids(self, date_str: str, outbox_ids: list[str], session=None) -> set[str]:
+        doc = await self._jobs_collection.find_one(
+            {"dateDocId": date_str, "deliveredOutboxIds": {"$in": outbox_ids}},
+            {"_id": 0, "deliveredOutboxIds": 1}, session=session)
+        return set(doc["deliveredOutboxIds"]).intersection(outbox_ids) if doc else set()
+
+    async def update_randomizer_run_in_job_doc(self, response: RandomizerResponse1,date_str: str,team: str,shift: str, session=None,
+                                               seed: Optional[int] = None, sampling: Optional[dict] = None):
+        await self.append_randomizer_logs(date_str, [self.build_randomizer_log_item(response, team, shift, seed, sampling)],
+                                          session=session)
+
+    async def iter_randomizer_logs(self, start_date: str, end_date: str, session=None) -> AsyncIterator[dict]:
+        """
+        Yield {dateDocId, randomizerLog} per job doc in [start_date, end_date], oldest first.
+
+        Raw documents straight off the cursor (no JobDocument validation), in small
+        batches so at most a few days of logs are held in memory at once.
+        """
+        cursor = self._jobs_collection.find(
+            {"dateDocId": {"$gte": start_date, "$lte": end_date}},
+            {"_id": 0, "dateDocId": 1, "randomizerLog": 1},
+            session=session
+        ).sort("dateDocId", 1).batch_size(4)
+        async for doc in cursor:
+            yield doc
+
+    async def get_randomizer_summary(self, start_date: str, end_date: str, session=None) -> list[dict]:
+        """
+        Randomizer runs in [start_date, end_date] aggregated per team and category.
+
+        The job docs are matched on the dateDocId index and only the team, shift and
+        selected employeeIds of each log entry are projected, so a month of audits is
+        one aggregation instead of a full JobDocument fetch per day. Distinct employees
+        are counted on the server too (one group per team, category and employee), so
+        only a few numbers per team come back however long the range is.
+        """
         query = self._jobs_collection.aggregate(
-            pipeline
+            [
+                {
+                    '$match': {
+                        'dateDocId': {'$gte': start_date, '$lte': end_date}
+                    }
+                }, {
+                '$project': {
+                    '_id': 0,
+                    'dateDocId': 1,
+                    'randomizerLog.shift': 1,
+                    'randomizerLog.allotedTeam': 1,
+                    'randomizerLog.randomizerResult.mainList.employeeId': 1,
+                    'randomizerLog.randomizerResult.standbyList.employeeId': 1
+                }
+            }, {
+                '$unwind': '$randomizerLog'
+            }, {
+                '$project': {
+                    'dateDocId': 1,
+                    'team': {'$ifNull': ['$randomizerLog.allotedTeam', '$randomizerLog.shift']},
+                    'main': {'$ifNull': ['$randomizerLog.randomizerResult.mainList.employeeId', []]},
+                    'standby': {'$ifNull': ['$randomizerLog.randomizerResult.standbyList.employeeId', []]}
+                }
+            }, {
+                '$facet': {
+                    'teams': [{
+                        '$group': {
+                            '_id': '$team',
+                            'runs': {'$sum': 1},
+                            'days': {'$addToSet': '$dateDocId'},
+                            'mainSelections': {'$sum': {'$size': '$main'}},
+                            'standbySelections': {'$sum': {'$size': '$standby'}}
+                        }
+                    }, {
+                        '$project': {
+                            '_id': 0,
+                            'team': '$_id',
+                            'runs': 1,
+                            'days': {'$size': '$days'},
+                            'mainSelections': 1,
+                            'standbySelections': 1
+                        }
+                    }, {
+                        '$sort': {'team': 1}
+                    }],
+                    'employees': [{
+                        '$project': {
+                            'team': 1,
+                            'selected': {'$concatArrays': [
+                                {'$map': {'input': '$main', 'in': {'category': 'main', 'employeeId': '$$this'}}},
+                                {'$map': {'input': '$standby', 'in': {'category': 'standby', 'employeeId': '$$this'}}}
+                            ]}
+                        }
+                    }, {
+                        '$unwind': '$selected'
+                    }, {
+                        '$group': {
+                            '_id': {'team': '$team', 'category': '$selected.category',
+                                    'employeeId': '$selected.employeeId'}
+                        }
+                    }, {
+                        '$group': {
+                            '_id': {'team': '$_id.team', 'category': '$_id.category'},
+                            'distinct': {'$sum': 1}
+                        }
+                    }]
+                }
+            }
+            ],
+            session=session
         )
-        await query.to_list(length=None)
-        print(f"done adding randomizer response to job doc {pipeline}")
+        result = (await query.to_list(length=1))[0]
+        distinct = {(row["_id"]["team"], row["_id"]["category"]): row["distinct"] for row in result["employees"]}
+        summary = []
+        for team in result["teams"]:
+            for category, prefix in (("Main", "main"), ("Standby", "standby")):
+                summary.append({
+                    "team": team["team"],
+                    "category": category,
+                    "runs": team["runs"],
+                    "days": team["days"],
+                    "selections": team[f"{prefix}Selections"],
+                    "distinctEmployees": distinct.get((team["team"], prefix), 0),
+                })
+        return summary
 
     async def remove_user_from_current_job_doc(self, date, userId, session=None):
-        print(f"date str : {date}")
-        await self._jobs_collection.update_one(
-            {"dateDocId": date},  # Match the document with the specific dateDocId
-            {"$pull": {"users": {"userid": userId}}}  # Remove the user with the given userid
+        await self._jobs_collection.update_many(
+            {"dateDocId": {"$gte": date}},  # today's job doc and the pre-generated ones after it
+            {"$pull": {"users": {"userid": userId}}},  # Remove the user with the given userid
+            session=session
         )
+
+        def remove_user(job_doc: JobDocument):
+            job_doc.users = [user for user in job_doc.users if user.userid != userId]
+        self._write_through(date, remove_user, session=session, and_later=True)
         
 
 
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Optional, Sequence
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+
+class MongoConnectionManager:
+    """
+    Owns the single AsyncIOMotorClient of the process (one per Lambda container).
+
+    The client and its pool are created once, lazily on first use or eagerly from the
+    FastAPI lifespan, and every DAL, session and transaction borrows from that pool
+    instead of paying for a new client / TLS handshake per request.
+    """
+
+    def __init__(self, uri_factory: Callable[[], str], max_pool_size: int = 10, min_pool_size: int = 0,
+                 max_idle_time_ms: Optional[int] = None, server_selection_timeout_ms: int = 5000,
+                 warmup_pings: int = 1, event_listeners: Sequence = ()):
+        self._uri_factory = uri_factory
+        self._client_options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "serverSelectionTimeoutMS": server_selection_timeout_ms,
+        }
+        if max_idle_time_ms is not None:
+            self._client_options["maxIdleTimeMS"] = max_idle_time_ms
+        self._warmup_pings = warmup_pings
+        # pymongo monitoring listeners (see metrics.CommandStatsListener); kept out of
+        # _client_options, which /api/health reports
+        self._event_listeners = list(event_listeners)
+        self._client: Optional[AsyncIOMotorClient] = None
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            self._client = AsyncIOMotorClient(self._uri_factory(), event_listeners=self._event_listeners,
+                                              **self._client_options)
+        return self._client
+
+    def use_client(self, client: AsyncIOMotorClient):
+        """Adopt an existing client (a local mongod, or mongomock-motor in the benchmark harness)."""
+        self.close()
+        self._client = client
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def get_database(self) -> AsyncIOMotorDatabase:
+        return self.client.get_default_database()
+
+    async def warm_up(self):
+        # concurrent pings check out several pooled connections at once, so the TLS
+        # handshakes happen here instead of on the first requests
+        pings = max(self._warmup_pings, self._client_options["minPoolSize"], 1)
+        await asyncio.gather(*(self.client.admin.command("ping") for _ in range(pings)))
+
+    async def ping(self) -> float:
+        start = time.perf_counter()
+        await self.client.admin.command("ping")
+        return (time.perf_counter() - start) * 1000
+
+    async def health(self) -> dict:
+        try:
+            latency_ms = await self.ping()
+        except Exception as e:
+            return {"status": "down", "error": str(e)}
+        return {"status": "up", "pingMs": round(latency_ms, 2), "pool": self._client_options}
+
+    @asynccontextmanager
+    async def session(self):
+        async with await self.client.start_session() as session:
+            yield session
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with self.session() as session:
+            async with session.start_transaction():
+                yield session
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
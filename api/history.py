@@ -0,0 +1,175 @@
+"""
+Selection history: who the randomizer picked, when, indexed by employee.
+
+Two collections are maintained as randomizer log entries are appended to job docs:
+one event per employee per run (indexed on employeeId + dateDocId) for history and
+range statistics, and one summary per employee (last selection, counts) for fairness
+weighting. Neither needs the job docs' randomizerLog arrays at read time.
+
+    python history.py --rebuild   # backfill both from the existing job docs, in one pass
+"""
+import asyncio
+import sys
+from collections import Counter
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from applog import get_logger
+
+log = get_logger("history")
+
+CATEGORIES = (("main", "mainList"), ("standby", "standbyList"))
+# one selection event per employee per run; unique-indexed (indexes.py)
+EVENT_KEY = ("employeeId", "dateDocId", "selectedAt")
+
+
+class SelectionHistoryDAL:
+    """
+    Per-employee summary of randomizer selections (last selection, counts), one document
+    per employeeId, plus one event document per selection, both folded in as log entries
+    are appended so fairness and audit reads hit a handful of indexed documents instead
+    of scanning past randomizerLog arrays.
+    """
+
+    def __init__(self, stats_collection: AsyncIOMotorCollection, events_collection: AsyncIOMotorCollection):
+        self._stats_collection = stats_collection
+        self._events_collection = events_collection
+
+    async def record(self, date_str: str, log_items: list[dict], session=None):
+        """
+        Fold randomizer log entries in. Idempotent: an event is keyed on (dateDocId, selectedAt,
+        employeeId) and upserted, and the summary counts only grow by the events that were new,
+        so a retried run (outbox redelivery, resubmit after an error) is not counted twice.
+        """
+        events = []
+        for item in log_items:
+            result = item["randomizerResult"]
+            for category, list_name in CATEGORIES:
+                for person in result.get(list_name, []):
+                    events.append({"_id": ObjectId(), "employeeId": person["employeeId"], "dateDocId": date_str,
+                                   "selectedAt": item["triggerDateTime"], "category": category,
+                                   "shift": item.get("shift"), "team": item.get("allotedTeam")})
+        if not events:
+            return
+        try:
+            res = await self._events_collection.bulk_write(
+                [UpdateOne({key: event[key] for key in EVENT_KEY}, {"$setOnInsert": event}, upsert=True)
+                 for event in events],
+                ordered=False,
+                session=session
+            )
+            upserted = res.upserted_ids.values()
+        except BulkWriteError as e:
+            # two writers upserting the same event: one inserts it, the other gets a duplicate key
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            upserted = [upsert["_id"] for upsert in e.details.get("upserted", [])]
+        # our own _ids on insert tell which events are new
+        inserted = set(upserted)
+
+        latest: dict[str, datetime] = {}
+        counts: dict[str, Counter] = {}
+        for event in (event for event in events if event["_id"] in inserted):
+            employee_id = event["employeeId"]
+            latest[employee_id] = max(latest.get(employee_id, event["selectedAt"]), event["selectedAt"])
+            counts.setdefault(employee_id, Counter())[f"{event['category']}Selections"] += 1
+        if not latest:
+            return
+        await self._stats_collection.bulk_write(
+            [UpdateOne({"employeeId": employee_id},
+                       {"$max": {"lastSelectedAt": selected_at, "lastSelectedOn": date_str},
+                        "$inc": dict(counts[employee_id])},
+                       upsert=True)
+             for employee_id, selected_at in latest.items()],
+            ordered=False,
+            session=session
+        )
+        log.debug("selection history updated for %d employee(s)", len(latest))
+
+    async def last_selected(self, employee_ids: list[str], session=None) -> dict[str, datetime]:
+        query = self._stats_collection.find({"employeeId": {"$in": employee_ids}},
+                                            {"_id": 0, "employeeId": 1, "lastSelectedAt": 1}, session=session)
+        return {doc["employeeId"]: doc["lastSelectedAt"] async for doc in query}
+
+    async def get_stats(self, employee_id: str, session=None) -> Optional[dict]:
+        return await self._stats_collection.find_one({"employeeId": employee_id}, {"_id": 0}, session=session)
+
+    @staticmethod
+    def _date_filter(employee_id: str, start: Optional[str], end: Optional[str]) -> dict:
+        query: dict = {"employeeId": employee_id}
+        if start or end:
+            query["dateDocId"] = {**({"$gte": start} if start else {}), **({"$lte": end} if end else {})}
+        return query
+
+    def iter_events(self, employee_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                    limit: int = 0, session=None) -> AsyncIterator[dict]:
+        """An employee's selections in [start, end], newest first, straight off the unique events index."""
+        return self._events_collection.find(
+            self._date_filter(employee_id, start, end), {"_id": 0}, session=session
+        ).sort([("dateDocId", DESCENDING), ("selectedAt", DESCENDING)]).limit(limit)
+
+    async def get_range_stats(self, employee_id: str, start: Optional[str], end: Optional[str],
+                              session=None) -> dict:
+        """Selection counts per category and shift in [start, end], with the first and last selection."""
+        query = self._events_collection.aggregate(
+            [
+                {'$match': self._date_filter(employee_id, start, end)},
+                {
+                    '$group': {
+                        '_id': {'category': '$category', 'shift': '$shift'},
+                        'count': {'$sum': 1},
+                        'first': {'$min': '$selectedAt'},
+                        'last': {'$max': '$selectedAt'}
+                    }
+                }
+            ],
+            session=session
+        )
+        stats = {"employeeId": employee_id, "mainSelections": 0, "standbySelections": 0, "byShift": {},
+                 "firstSelectedAt": None, "lastSelectedAt": None}
+        async for group in query:
+            category, shift = group["_id"]["category"], group["_id"]["shift"]
+            stats[f"{category}Selections"] += group["count"]
+            by_shift = stats["byShift"].setdefault(shift, {"main": 0, "standby": 0})
+            by_shift[category] += group["count"]
+            stats["firstSelectedAt"] = min(filter(None, (stats["firstSelectedAt"], group["first"])))
+            stats["lastSelectedAt"] = max(filter(None, (stats["lastSelectedAt"], group["last"])))
+        return stats
+
+    async def rebuild(self, jobs_collection: AsyncIOMotorCollection) -> int:
+        """Recreate both collections from every job doc's randomizerLog; returns the runs replayed."""
+        await self._stats_collection.delete_many({})
+        await self._events_collection.delete_many({})
+        runs = 0
+        cursor = jobs_collection.find({"randomizerLog.0": {"$exists": True}},
+                                      {"_id": 0, "dateDocId": 1, "randomizerLog": 1}).sort("dateDocId", 1).batch_size(4)
+        async for doc in cursor:
+            await self.record(doc["dateDocId"], doc["randomizerLog"])
+            runs += len(doc["randomizerLog"])
+        return runs
+
+
+def main(argv=sys.argv[1:]):
+    from main import get_config, make_history_dal, mongo
+
+    if "--rebuild" not in argv:
+        print(__doc__)
+        return 2
+
+    async def run():
+        jobs = mongo.get_database().get_collection(get_config()["JOB_COLLECTION_NAME"])
+        runs = await make_history_dal().rebuild(jobs)
+        print(f"selection history rebuilt from {runs} randomizer run(s)")
+        mongo.close()
+        return 0
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Index bootstrap and query-plan check for the collections the DALs query.
+
+    python indexes.py            # create missing indexes (idempotent)
+    python indexes.py --verify   # also explain the DAL queries, exit 1 on a COLLSCAN
+
+The lifespan runs `ensure_indexes` on startup; on Lambda run the CLI once per deploy.
+"""
+import asyncio
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# logical collection -> indexes; names are fixed so re-runs are no-ops
+INDEX_SPECS = {
+    "users": [
+        IndexModel([("employeeId", ASCENDING)], name="employeeId_unique", unique=True),
+        IndexModel([("shift", ASCENDING), ("employeeId", ASCENDING)], name="shift_employeeId"),
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "jobs": [
+        IndexModel([("dateDocId", ASCENDING)], name="dateDocId_unique", unique=True),
+        IndexModel([("users.userid", ASCENDING)], name="users_userid"),
+    ],
+    "outbox": [
+        IndexModel([("status", ASCENDING), ("availableAt", ASCENDING)], name="status_availableAt"),
+        IndexModel([("claimId", ASCENDING)], name="claimId", sparse=True),
+        # finished items are kept a week for auditing
+        IndexModel([("completedOn", ASCENDING)], name="completedOn_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "selectionStats": [
+        IndexModel([("employeeId", ASCENDING)], name="employeeId_unique", unique=True),
+    ],
+    "selectionEvents": [
+        # also the idempotency key of SelectionHistoryDAL.record
+        IndexModel([("employeeId", ASCENDING), ("dateDocId", DESCENDING), ("selectedAt", DESCENDING)],
+                   name="employeeId_dateDocId_selectedAt_unique", unique=True),
+    ],
+}
+
+
+def _plan_queries(names: dict[str, str]) -> list[tuple[str, dict]]:
+    """The DAL's filtered queries, as (label, command to explain)."""
+    users, jobs, outbox, stats = names["users"], names["jobs"], names["outbox"], names["selectionStats"]
+    events = names["selectionEvents"]
+    return [
+        ("users by employeeId", {"find": users, "filter": {"employeeId": "0"}}),
+        ("users by email", {"find": users, "filter": {"email": "a@b.c"}}),
+        ("users by shift", {"find": users, "filter": {"shift": "alpha"}}),
+        ("users page after employeeId",
+         {"find": users, "filter": {"employeeId": {"$gt": "0"}}, "sort": {"employeeId": 1}, "limit": 100}),
+        ("job doc by dateDocId", {"find": jobs, "filter": {"dateDocId": "2025-01-01"}}),
+        ("job docs by date range",
+         {"find": jobs, "filter": {"dateDocId": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}}),
+        ("job docs by users.userid", {"find": jobs, "filter": {"users.userid": "0"}}),
+        ("active users by shift ($lookup on employeeId)", {
+            "aggregate": jobs,
+            "pipeline": [
+                {"$match": {"dateDocId": "2025-01-01"}},
+                {"$unwind": "$users"},
+                {"$lookup": {"from": users, "localField": "users.userid", "foreignField": "employeeId",
+                             "as": "userDetails"}},
+            ],
+            "cursor": {},
+        }),
+        ("active users by shift (roster snapshot)", {
+            "aggregate": jobs,
+            "pipeline": [
+                {"$match": {"dateDocId": "2025-01-01"}},
+                {"$project": {"roster": {"$filter": {"input": "$users", "cond": {"$eq": ["$$this.shift", "alpha"]}}}}},
+            ],
+            "cursor": {},
+        }),
+        ("outbox claim", {"find": outbox, "filter": {"status": "pending"}, "sort": {"availableAt": 1}}),
+        ("outbox last completed", {"find": outbox, "filter": {"completedOn": {"$exists": True}},
+                                   "sort": {"completedOn": -1}, "limit": 1}),
+        ("selection stats by employeeId", {"find": stats, "filter": {"employeeId": {"$in": ["0", "1"]}}}),
+        ("selection events by employeeId and date", {
+            "find": events, "filter": {"employeeId": "0", "dateDocId": {"$gte": "2025-01-01", "$lte": "2025-12-31"}},
+            "sort": {"dateDocId": -1, "selectedAt": -1}, "limit": 100}),
+    ]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase, names: dict[str, str]) -> dict[str, list[str]]:
+    created = {}
+    for logical, models in INDEX_SPECS.items():
+        created[names[logical]] = await db.get_collection(names[logical]).create_indexes(models)
+    return created
+
+
+def _collection_scans(explain: dict) -> list[str]:
+    """Every COLLSCAN stage / unindexed $lookup strategy anywhere in an explain document."""
+    found = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("stage") == "COLLSCAN":
+                found.append("COLLSCAN")
+            if node.get("strategy") == "NestedLoopJoin":
+                found.append("$lookup NestedLoopJoin")
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain)
+    return found
+
+
+async def verify_query_plans(db: AsyncIOMotorDatabase, names: dict[str, str]) -> list[str]:
+    """Explain each DAL query; return one line per query that falls back to a collection scan."""
+    failures = []
+    for label, command in _plan_queries(names):
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        scans = _collection_scans(explain)
+        print(f"{'FAIL' if scans else 'ok  '} {label}{': ' + ', '.join(scans) if scans else ''}")
+        if scans:
+            failures.append(label)
+    return failures
+
+
+def main(argv=sys.argv[1:]):
+    from main import collection_names, mongo
+
+    async def run():
+        db = mongo.get_database()
+        names = collection_names()
+        for collection, created in (await ensure_indexes(db, names)).items():
+            print(f"{collection}: {', '.join(created)}")
+        failures = await verify_query_plans(db, names) if "--verify" in argv else []
+        mongo.close()
+        return 1 if failures else 0
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Optional, Protocol
+
+from pydantic import BaseModel
+
+from applog import get_logger
+
+log = get_logger("mailer")
+
+MAIL_FROM = "Admin@controltowerdelhi.in"
+MAIL_SUBJECT = "Be sober before shift"
+MAIL_HTML = {
+    "main": "<p>Hi! Please be ready for drug test before your shift</p>",
+    "standby": "<p>Hi! Please be ready for drug test before your shift. Your are part of standby list</p>",
+}
+
+# Resend accepts at most 100 emails per batch request
+RESEND_BATCH_LIMIT = 100
+
+
+class MailTransport(Protocol):
+    def send_batch(self, emails: list[dict]) -> list[str]:
+        """Send the emails in one API call (blocking) and return their ids."""
+
+
+class TransientMailError(Exception):
+    """A failure worth retrying (rate limit, 5xx, network)."""
+
+
+class ResendBatchTransport:
+    def __init__(self, api_key_factory: Callable[[], str]):
+        self._api_key_factory = api_key_factory
+
+    def send_batch(self, emails: list[dict]) -> list[str]:
+        import requests
+        import resend
+
+        resend.api_key = self._api_key_factory()
+        try:
+            response = resend.Batch.send(emails)
+        except resend.exceptions.ResendError as e:
+            if str(e.code) == "429" or str(e.code).startswith("5"):
+                raise TransientMailError(str(e)) from e
+            raise
+        except requests.RequestException as e:
+            raise TransientMailError(str(e)) from e
+        return [item["id"] for item in response.get("data", [])]
+
+
+class BatchOutcome(BaseModel):
+    listType: str
+    batch: int
+    recipients: int
+    status: str
+    attempts: int
+    elapsedMs: float
+    ids: list[str] = []
+    error: Optional[str] = None
+
+
+class DispatchResult(BaseModel):
+    status: str
+    sent: int
+    failed: int
+    batches: list[BatchOutcome]
+    # per list type, for re-queueing only what did not go out
+    failedRecipients: dict[str, list[str]] = {}
+
+
+def build_emails(recipients: list[str], list_type: str) -> list[dict]:
+    # one email per recipient: recipients no longer see each other's addresses
+    return [
+        {"from": MAIL_FROM, "to": [email], "subject": MAIL_SUBJECT, "html": MAIL_HTML[list_type]}
+        for email in recipients
+    ]
+
+
+class MailDispatcher:
+    """
+    Sends randomizer notifications through a batch transport without blocking the loop.
+
+    Each batch runs in a worker thread; at most `max_concurrency` are in flight across
+    all lists, transient failures are retried with exponential backoff and jitter, and
+    every batch reports its own outcome.
+    """
+
+    def __init__(self, transport: MailTransport, batch_size: int = RESEND_BATCH_LIMIT, max_concurrency: int = 4,
+                 max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0):
+        self._transport = transport
+        self._batch_size = min(batch_size, RESEND_BATCH_LIMIT)
+        self._max_concurrency = max_concurrency
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+    async def dispatch(self, recipients_by_type: dict[str, list[str]]) -> DispatchResult:
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        jobs = []
+        for list_type, recipients in recipients_by_type.items():
+            emails = build_emails(recipients, list_type)
+            for index, start in enumerate(range(0, len(emails), self._batch_size)):
+                jobs.append(self._send_batch(semaphore, list_type, index, emails[start:start + self._batch_size]))
+        outcomes = list(await asyncio.gather(*jobs))
+        sent = sum(o.recipients for o in outcomes if o.status == "sent")
+        failed = sum(o.recipients for o in outcomes if o.status != "sent")
+        failed_recipients: dict[str, list[str]] = {}
+        for outcome in outcomes:
+            if outcome.status != "sent":
+                start = outcome.batch * self._batch_size
+                batch = recipients_by_type[outcome.listType][start:start + self._batch_size]
+                failed_recipients.setdefault(outcome.listType, []).extend(batch)
+        status = "success" if not failed else ("partial" if sent else "failed")
+        return DispatchResult(status=status, sent=sent, failed=failed, batches=outcomes,
+                              failedRecipients=failed_recipients)
+
+    async def _send_batch(self, semaphore: asyncio.Semaphore, list_type: str, index: int,
+                          emails: list[dict]) -> BatchOutcome:
+        start = time.perf_counter()
+        attempt = 0
+        async with semaphore:
+            while True:
+                attempt += 1
+                try:
+                    ids = await asyncio.to_thread(self._transport.send_batch, emails)
+                    status, error = "sent", None
+                    break
+                except TransientMailError as e:
+                    status, error, ids = "failed", str(e), []
+                    if attempt >= self._max_attempts:
+                        break
+                    delay = min(self._max_delay, self._base_delay * 2 ** (attempt - 1))
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                except Exception as e:
+                    status, error, ids = "failed", str(e), []
+                    break
+        outcome = BatchOutcome(listType=list_type, batch=index, recipients=len(emails), status=status,
+                               attempts=attempt, elapsedMs=round((time.perf_counter() - start) * 1000, 2),
+                               ids=ids, error=error)
+        log.log(logging.INFO if status == "sent" else logging.WARNING, "mail batch %s#%d: %s after %d attempt(s)",
+                list_type, index, status, attempt, extra=outcome.model_dump(exclude={"ids"}))
+        return outcome
@@ -1,37 +1,72 @@
-import io
+import time
+
+# taken before the imports below so the first request can report the whole cold start
+PROCESS_STARTED = time.perf_counter()
+
+import asyncio
+import importlib
 from contextlib import asynccontextmanager
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
 import sys
-from enum import unique
 from mangum import Mangum
 
-import pandas as pd
-from fastapi import FastAPI, Path, logger, status, HTTPException, Depends,Query
-import uvicorn
-from motor.motor_asyncio import AsyncIOMotorClient
-import random
-
-from dal import JobsDAL, ShiftUpdateRequest, UserListDAL, User, UserNotFoundError, UserRequest, JobUserItem, ShiftDetail, \
-    EmployeeByShiftResponse, RandomizerResponse1
+from fastapi import FastAPI, Path, HTTPException, Depends,Query, UploadFile
+
+from applog import configure_logging, get_logger
+from db import MongoConnectionManager
+from metrics import CommandStatsListener, MetricsRegistry, TimingMiddleware
+from capture import CaptureMiddleware, CaptureSink
+from cache import JobDocCache, RosterCache, SingleFlight, watch_roster_changes
+from mailer import DispatchResult, MailDispatcher, ResendBatchTransport
+from indexes import ensure_indexes
+from rotation import load_rotation
+from randomizer import RandomizerEngine, replay
+from history import SelectionHistoryDAL
+from outbox import OUTBOX_EMAIL, OUTBOX_RANDOMIZER_LOG, OutboxDAL, OutboxWorker
+from user_import import ImportFormatError, ImportResult, ImportRowResult, detect_format, parse_rows, validate_rows
+from report import MEDIA_TYPES, REPORT_WRITERS, iter_report_rows, stream_ndjson_docs
+from dal import JobsDAL, ShiftBatchUpdateResult, ShiftUpdateRequest, UserListDAL, User, UserNotFoundError, UserRequest, JobUserItem, ShiftDetail, \
+    EmployeeByShiftResponse, JobDocBatchResult, JobDocument, RandomizerResponse1
 
 # from api.dal import JobsDAL, ShiftUpdateRequest, UserListDAL, User, UserRequest, JobUserItem, ShiftDetail, \
 #     EmployeeByShiftResponse, RandomizerResponse1
 
-from typing import Annotated, List
+from typing import Annotated, AsyncIterator, List, Literal
 
 
 from dotenv import load_dotenv
-import resend
 from pymongo.errors import DuplicateKeyError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
 from functools import lru_cache
 
 env_path = '.env'
 load_dotenv(env_path)
 
-DEBUG = os.environ.get("DEBUG", "").strip().lower() in {"1", "true", "on", "yes"}
+def _env_int(name: str, default: int | None) -> int | None:
+    value = os.environ.get(name, "").strip()
+    return int(value) if value else default
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name, "").strip().lower()
+    return value in {"1", "true", "on", "yes"} if value else default
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name, "").strip()
+    return float(value) if value else default
+
+DEBUG = _env_flag("DEBUG")
+
+configure_logging()
+log = get_logger("main")
+
+# openpyxl (xlsx reports), resend (mail) and uvicorn (local server) are imported
+# where they are used so a Lambda cold start for the roster/randomizer routes does
+# not pay for them. Set EAGER_IMPORTS for provisioned concurrency / SnapStart where
+# the init phase is free and the first report request should not pay instead.
+EAGER_IMPORTS = _env_flag("EAGER_IMPORTS")
 
 
 
@@ -44,13 +79,103 @@ def get_config():
         "RESEND_API_KEY": os.environ["RESEND_API_KEY"],     
     }
 
+def collection_names() -> dict[str, str]:
+    return {
+        "users": get_config()["USER_COLLECTION_NAME"],
+        "jobs": get_config()["JOB_COLLECTION_NAME"],
+        "outbox": os.environ.get("OUTBOX_COLLECTION_NAME", "outbox"),
+        "selectionStats": os.environ.get("SELECTION_STATS_COLLECTION_NAME", "selection_stats"),
+        "selectionEvents": os.environ.get("SELECTION_EVENTS_COLLECTION_NAME", "selection_events"),
+    }
+
+# per-route latency and DB round trips: Server-Timing headers, EMF log lines, /api/metrics
+METRICS_ENABLED = _env_flag("METRICS_ENABLED", True)
+metrics_registry = MetricsRegistry()
+
+# one client / pool per process (per Lambda container), shared by every DAL and transaction
+mongo = MongoConnectionManager(
+    lambda: get_config()["MONGODB_URI"],
+    max_pool_size=_env_int("MONGODB_MAX_POOL_SIZE", 10),
+    min_pool_size=_env_int("MONGODB_MIN_POOL_SIZE", 0),
+    max_idle_time_ms=_env_int("MONGODB_MAX_IDLE_TIME_MS", None),
+    server_selection_timeout_ms=_env_int("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000),
+    warmup_pings=_env_int("MONGODB_WARMUP_PINGS", 1),
+    event_listeners=[CommandStatsListener(count_bytes=_env_flag("METRICS_DB_BYTES"))] if METRICS_ENABLED else (),
+)
+
 async def get_database_connection():
-    if not hasattr(get_database_connection, "client"):
-        get_database_connection.client = AsyncIOMotorClient(get_config()["MONGODB_URI"])
-    return get_database_connection.client.get_default_database()
+    return mongo.get_database()
+
+
+# shared by every UserListDAL of the process; TTL 0 disables expiry (change stream / single instance)
+roster_cache = RosterCache(ttl_seconds=_env_int("ROSTER_CACHE_TTL_SECONDS", 30) or None) \
+    if _env_flag("ROSTER_CACHE_ENABLED", True) else None
 
-async def get_database_connection_client():
-    return AsyncIOMotorClient(get_config()["MONGODB_URI"])
+# parsed JobDocuments per dateDocId, kept current by JobsDAL's own writes
+job_doc_cache = JobDocCache(max_entries=_env_int("JOB_DOC_CACHE_MAX_ENTRIES", 32),
+                            ttl_seconds=_env_int("JOB_DOC_CACHE_TTL_SECONDS", 15) or None) \
+    if _env_flag("JOB_DOC_CACHE_ENABLED", True) else None
+
+# new job docs embed name/designation/email/phone/shift per user, shift queries skip the $lookup
+JOB_DOC_ROSTER_SNAPSHOT = _env_flag("JOB_DOC_ROSTER_SNAPSHOT")
+
+# identical job doc / shift roster reads in flight at once (shift change bursts) share one query
+single_flight = SingleFlight() if _env_flag("SINGLE_FLIGHT_ENABLED", True) else None
+
+# which team works which shift on a date; backs job doc creation and the calendar.
+# A shift name ShiftDetail has no field for fails here, at load time
+rotation = load_rotation(os.environ.get("ROTATION_CONFIG_FILE"), shifts=ShiftDetail.model_fields)
+
+# share of a shift's active roster tested and how it splits into main/standby;
+# fairness weighting is off unless RANDOMIZER_FAIRNESS_DAYS is set
+randomizer = RandomizerEngine(
+    fraction=_env_float("RANDOMIZER_FRACTION", 0.4),
+    shift_fractions={shift: _env_float(f"RANDOMIZER_FRACTION_{shift.upper()}", 0)
+                     for shift in rotation.shifts if os.environ.get(f"RANDOMIZER_FRACTION_{shift.upper()}")},
+    main_share=_env_float("RANDOMIZER_MAIN_SHARE", 5 / 8),
+    fairness_days=_env_float("RANDOMIZER_FAIRNESS_DAYS", 0),
+    min_weight=_env_float("RANDOMIZER_FAIRNESS_MIN_WEIGHT", 0.2),
+)
+
+# with the outbox on, mail and randomizer log writes are queued and drained by
+# worker.handler (Lambda) or, with OUTBOX_LOCAL_WORKER, a task of this process
+OUTBOX_ENABLED = _env_flag("OUTBOX_ENABLED")
+
+mail_dispatcher = MailDispatcher(
+    ResendBatchTransport(lambda: get_config()["RESEND_API_KEY"]),
+    batch_size=_env_int("MAIL_BATCH_SIZE", 100),
+    max_concurrency=_env_int("MAIL_MAX_CONCURRENCY", 4),
+    max_attempts=_env_int("MAIL_MAX_ATTEMPTS", 4),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await mongo.warm_up()
+    except Exception as e:
+        log.warning("mongo warm up failed: %s", e)
+    if _env_flag("ENSURE_INDEXES", True):
+        try:
+            await ensure_indexes(mongo.get_database(), collection_names())
+        except Exception as e:
+            log.error("index creation failed: %s", e)
+    background_tasks = []
+    if OUTBOX_ENABLED and _env_flag("OUTBOX_LOCAL_WORKER"):
+        background_tasks.append(asyncio.create_task(get_outbox_worker().run_forever()))
+    job_doc_scheduler = None
+    if _env_flag("JOB_DOC_SCHEDULER"):
+        job_doc_scheduler = make_job_doc_scheduler()
+        job_doc_scheduler.start()
+    if roster_cache is not None and _env_flag("ROSTER_CACHE_CHANGE_STREAM"):
+        user_collection = mongo.get_database().get_collection(get_config()["USER_COLLECTION_NAME"])
+        background_tasks.append(asyncio.create_task(watch_roster_changes(user_collection, roster_cache)))
+    yield
+    if job_doc_scheduler is not None:
+        job_doc_scheduler.shutdown(wait=False)
+    for task in background_tasks:
+        task.cancel()
+    mongo.close()
 
 origins = [
     "http://localhost",
@@ -61,26 +186,129 @@ origins = [
     "*"
 ]
 
-app = FastAPI(debug=DEBUG)
+app = FastAPI(debug=DEBUG, lifespan=lifespan, default_response_class=ORJSONResponse)
+
+
+@lru_cache()
+def _route_templates() -> dict:
+    return {route.endpoint: route.path for route in app.routes if hasattr(route, "endpoint")}
+
+
+def route_name(scope: dict) -> str:
+    # the router leaves the matched endpoint in the scope; metrics are per template, not per URL
+    path = _route_templates().get(scope.get("endpoint"), "unmatched")
+    return f"{scope['method']} {path}"
+
+
+if METRICS_ENABLED:
+    app.add_middleware(TimingMiddleware, registry=metrics_registry, route_name=route_name,
+                       namespace=os.environ.get("METRICS_NAMESPACE", "shift-randomizer"),
+                       emit_logs=_env_flag("METRICS_LOG", True), process_started=PROCESS_STARTED)
+
+# request shapes for bench/replay.py; off unless CAPTURE_ENABLED
+if _env_flag("CAPTURE_ENABLED"):
+    app.add_middleware(CaptureMiddleware, sink=CaptureSink(os.environ.get("CAPTURE_FILE", "captures.jsonl")),
+                       route_name=route_name, sample_rate=_env_float("CAPTURE_SAMPLE_RATE", 1.0),
+                       bodies=_env_flag("CAPTURE_BODIES"), max_body_bytes=_env_int("CAPTURE_MAX_BODY_BYTES", 65536))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # readable by the browser client (devtools shows Server-Timing regardless)
+    expose_headers=["Server-Timing", "X-Randomizer-Seed"],
 )
 
+# DAL output is built with model_construct from trusted Mongo docs; these routes dump it
+# straight to JSON bytes instead of letting the response_model validate it a second time
+USER_LIST = TypeAdapter(list[User])
+EMPLOYEE_LIST = TypeAdapter(list[EmployeeByShiftResponse])
+
+
+def model_json(adapter: TypeAdapter, value) -> Response:
+    return Response(adapter.dump_json(value), media_type="application/json")
+
+
+# list routes: without after/limit/fields/format they return the whole list as before
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+ListFormat = Annotated[Literal["json", "ndjson"], Query(alias="format")]
+PageLimit = Annotated[int | None, Query(ge=1, le=MAX_PAGE_SIZE)]
+
+
+class Page(BaseModel):
+    """One keyset page: `items` carry the selected fields only, `next` is the `after` of the next page."""
+    items: list[dict]
+    next: str | None = None
+
+
+# the format=ndjson variant, for the OpenAPI schema (the route returns the stream itself)
+NDJSON_RESPONSE = {200: {"content": {MEDIA_TYPES["ndjson"]: {"schema": {"type": "string"}}}}}
+
+
+def _selected_fields(fields: str | None, model: type[BaseModel]) -> list[str] | None:
+    if fields is None:
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in model.model_fields]
+    if unknown or not selected:
+        raise HTTPException(status_code=400,
+                            detail=f"fields must be a comma separated subset of {', '.join(model.model_fields)}")
+    return selected
+
+
+async def paged_response(docs: AsyncIterator[dict], list_format: str, limit: int | None) -> Response:
+    if list_format == "ndjson":
+        return StreamingResponse(stream_ndjson_docs(docs), media_type=MEDIA_TYPES["ndjson"])
+    items = [doc async for doc in docs]
+    # a full page may have a successor: the client passes `next` back as `after`
+    next_after = items[-1]["employeeId"] if limit and len(items) == limit else None
+    return ORJSONResponse({"items": items, "next": next_after})
+
+
 async def get_users_dal():
     db = await get_database_connection()
-    return UserListDAL(db.get_collection(get_config()["USER_COLLECTION_NAME"]))
+    return UserListDAL(db.get_collection(get_config()["USER_COLLECTION_NAME"]), roster_cache)
 
-async def get_jobs_dal():
-    db = await get_database_connection()
-    return JobsDAL(db.get_collection(get_config()["JOB_COLLECTION_NAME"]))
+def make_history_dal() -> SelectionHistoryDAL:
+    db = mongo.get_database()
+    return SelectionHistoryDAL(db.get_collection(collection_names()["selectionStats"]),
+                               db.get_collection(collection_names()["selectionEvents"]))
 
-@app.get("/api/users")
-async def get_all_users(users_dal: UserListDAL = Depends(get_users_dal)) -> list[User]:
-    return await users_dal.get_user_list()
+async def get_history_dal():
+    return make_history_dal()
+
+def make_jobs_dal() -> JobsDAL:
+    db = mongo.get_database()
+    return JobsDAL(db.get_collection(get_config()["JOB_COLLECTION_NAME"]), get_config()["USER_COLLECTION_NAME"],
+                   randomizer_log_cap=_env_int("RANDOMIZER_LOG_MAX_ENTRIES", None), job_doc_cache=job_doc_cache,
+                   rotation=rotation, history=make_history_dal(), single_flight=single_flight,
+                   embed_roster=JOB_DOC_ROSTER_SNAPSHOT)
+
+async def get_jobs_dal():
+    return make_jobs_dal()
+
+def make_outbox_dal() -> OutboxDAL:
+    return OutboxDAL(mongo.get_database().get_collection(collection_names()["outbox"]))
+
+async def get_outbox_dal() -> OutboxDAL | None:
+    # None: side effects run inline in the request
+    return make_outbox_dal() if OUTBOX_ENABLED else None
+
+@app.get("/api/users", response_model=list[User] | Page, responses=NDJSON_RESPONSE)
+async def get_all_users(after: str | None = None, limit: PageLimit = None, fields: str | None = None,
+                        list_format: ListFormat = "json", users_dal: UserListDAL = Depends(get_users_dal)) -> Response:
+    """
+    Whole roster by default. With `after`/`limit`/`fields`, a keyset page by employeeId
+    (`{"items", "next"}`); with `format=ndjson`, one user per line streamed off the cursor.
+    """
+    if list_format == "json" and after is None and limit is None and fields is None:
+        return model_json(USER_LIST, await users_dal.get_user_list())
+    if list_format == "json":
+        limit = limit or DEFAULT_PAGE_SIZE
+    docs = users_dal.iter_users(_selected_fields(fields, User), after=after, limit=limit)
+    return await paged_response(docs, list_format, limit)
 
 
 # add user
@@ -89,16 +317,49 @@ async def create_user(user: UserRequest, users_dal: UserListDAL = Depends(get_us
     try:
         await users_dal.create_user(user)
         # add that user to todays job document as well
-        await jobs_dal.add_user_to_current_job_doc(datetime.today().strftime('%Y-%m-%d'), user.employeeId)
+        await jobs_dal.add_user_to_current_job_doc(datetime.today().strftime('%Y-%m-%d'), user.employeeId,
+                                                   roster=[user])
         return {"message": "User created successfully"}
     except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="User already exists")
 
 
+@app.post("/api/users/import", response_model=ImportResult)
+async def import_users(file: UploadFile,
+                       import_format: Annotated[Literal["csv", "xlsx", "json"] | None, Query(alias="format")] = None,
+                       users_dal: UserListDAL = Depends(get_users_dal),
+                       jobs_dal: JobsDAL = Depends(get_jobs_dal)) -> Response:
+    """Upsert users from a CSV/XLSX/JSON file by employeeId; new users join today's job doc."""
+    try:
+        import_format = import_format or detect_format(file.filename, file.content_type)
+        rows = await asyncio.to_thread(parse_rows, await file.read(), import_format)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    valid, results = validate_rows(rows)
+    outcomes = await users_dal.bulk_upsert_users([user for _, user in valid])
+    results.extend(ImportRowResult(row=row, employeeId=user.employeeId, **outcome)
+                   for (row, user), outcome in zip(valid, outcomes))
+    results.sort(key=lambda result: result.row)
+    created = [result.employeeId for result in results if result.status == "created"]
+    # one $push/$each for all of them, into today's and any pre-generated job docs
+    today = datetime.today().strftime('%Y-%m-%d')
+    await jobs_dal.add_users_to_job_docs(today, created, roster=[user for _, user in valid])
+    # and the job docs' roster snapshots (if any) pick up the edits of existing ones
+    updated_ids = {result.employeeId for result in results if result.status == "updated"}
+    await jobs_dal.refresh_roster_snapshots(today, {user.employeeId: user.model_dump()
+                                                    for _, user in valid if user.employeeId in updated_ids})
+    updated = sum(result.status == "updated" for result in results)
+    result = ImportResult(created=len(created), updated=updated, failed=len(results) - len(created) - updated,
+                          rows=results)
+    return Response(result.model_dump_json(), media_type="application/json")
+
+
 @app.put("/api/users/{user_id}")
 async def update_user(user_id: str, user: UserRequest, users_dal: UserListDAL = Depends(get_users_dal), jobs_dal: JobsDAL = Depends(get_jobs_dal)):
     try:
         await users_dal.update_user(user_id, user)
+        await jobs_dal.refresh_roster_snapshots(datetime.today().strftime('%Y-%m-%d'),
+                                                {user_id: user.model_dump(exclude={"employeeId"})})
         return {"message": "User updated successfully"}
     except UserNotFoundError:
         raise HTTPException(status_code=404, detail="User not found")
@@ -112,27 +373,24 @@ async def delete_user_by_userId(
     users_dal: UserListDAL = Depends(get_users_dal),
     jobs_dal: JobsDAL = Depends(get_jobs_dal)
 ):
-    db_connection = await get_database_connection_client()
-
     try:
-        # Start a session
-        async with await db_connection.start_session() as session:
-            # Start a transaction
-            async with session.start_transaction():
-                # Delete user from the user collection
-                await users_dal.delete_user_by_email(userId, session=session)
-                
-                # Remove user from today's job document
-                await jobs_dal.remove_user_from_current_job_doc(
-                    datetime.today().strftime('%Y-%m-%d'), userId, session=session
-                )
-
-                # If both operations succeed, commit automatically
-                print(f"User {userId} deleted successfully in both collections")
-                
-    except Exception as e:
+        # Start a session and transaction on the shared client
+        async with mongo.transaction() as session:
+            # Delete user from the user collection
+            await users_dal.delete_user_by_email(userId, session=session)
+
+            # Remove user from today's job document
+            await jobs_dal.remove_user_from_current_job_doc(
+                datetime.today().strftime('%Y-%m-%d'), userId, session=session
+            )
+
+            # If both operations succeed, commit automatically
+        users_dal.invalidate_roster_cache()
+        log.info("user deleted", extra={"employeeId": userId})
+
+    except Exception:
         # If any error occurs, it will automatically rollback
-        print(f"Error: {e}")
+        log.exception("deleting user %s failed", userId)
         raise HTTPException(status_code=500, detail="An error occurred while deleting the user")
 
     return {"message": "User deleted successfully"}
@@ -140,13 +398,47 @@ async def delete_user_by_userId(
 # update user
 
 # update shift
+@app.patch("/api/users/update_shift")
+async def update_user_shifts(shifts: dict[str, str],
+                             users_dal: UserListDAL = Depends(get_users_dal),
+                             jobs_dal: JobsDAL = Depends(get_jobs_dal)) -> ShiftBatchUpdateResult:
+    """Move many people at once: body is {employeeId: shift}."""
+    result = await users_dal.update_user_shifts(shifts)
+    await jobs_dal.refresh_roster_snapshots(datetime.today().strftime('%Y-%m-%d'),
+                                            {employee_id: {"shift": shift} for employee_id, shift in shifts.items()})
+    return result
+
+
 @app.patch("/api/users/update_shift/{employeeId}")
 async def update_user_shift(
         employeeId: Annotated[str, Path(title="employee id for the employee whose shift you want to change")],
         shift: ShiftUpdateRequest,
         users_dal: UserListDAL = Depends(get_users_dal),
         jobs_dal: JobsDAL = Depends(get_jobs_dal)):
-    return await users_dal.update_user_shift(employeeId, shift.shift)
+    result = await users_dal.update_user_shift(employeeId, shift.shift)
+    await jobs_dal.refresh_roster_snapshots(datetime.today().strftime('%Y-%m-%d'), {employeeId: {"shift": shift.shift}})
+    return result
+
+
+@app.get("/api/users/{employee_id}/selections")
+async def get_user_selections(employee_id: str, start: str | None = None, end: str | None = None,
+                              limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+                              history: SelectionHistoryDAL = Depends(get_history_dal)):
+    # newest first, from the selection_events index; page back with end=<oldest dateDocId>
+    items = [doc async for doc in history.iter_events(employee_id, start, end, limit)]
+    return {"employeeId": employee_id, "items": items}
+
+
+@app.get("/api/users/{employee_id}/selections/stats")
+async def get_user_selection_stats(employee_id: str, start: str | None = None, end: str | None = None,
+                                   history: SelectionHistoryDAL = Depends(get_history_dal)):
+    if start or end:
+        return await history.get_range_stats(employee_id, start, end)
+    # all-time totals are one summary document
+    stats = await history.get_stats(employee_id)
+    if stats is None:
+        return {"employeeId": employee_id, "mainSelections": 0, "standbySelections": 0, "lastSelectedAt": None}
+    return {"mainSelections": 0, "standbySelections": 0, **stats}
 
 
 @app.get("/api")
@@ -159,25 +451,19 @@ async def auth_test():
     return {"message": "testting auth!!"}
 
 
-@app.get("/api/jobdoc/{date_string}")
+@app.get("/api/jobdoc/{date_string}", response_model=JobDocument)
 async def getJobDoc(date_string: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
-    return await jobs_dal.get_job_doc(date_string)
+    job_doc = await jobs_dal.get_job_doc(date_string)
+    if job_doc is None:
+        raise HTTPException(status_code=404, detail=f"No job doc for {date_string}")
+    return Response(job_doc.model_dump_json(), media_type="application/json")
 
 
 @app.post("/api/jobdoc")
 async def createJobDoc(date: datetime = Query(...), jobs_dal: JobsDAL = Depends(get_jobs_dal), users_dal: UserListDAL = Depends(get_users_dal)):
-    print(f"date: {date} inside createJobDoc")
-    emp_id_list = await get_employee_list(users_dal)
-
-    return await jobs_dal.create_job_doc(date, emp_id_list)
-
-async def get_employee_list(users_dal: UserListDAL):
-    emp_ids = await users_dal.get_user_info({}, {"_id": 0, "employeeId": 1})
-    
-    # get list of employee ids
-    emp_id_list = l2 = [e['employeeId'] for e in emp_ids]
-    print(f"emp_ids: {emp_id_list}")
-    return emp_id_list
+    # one roster read for the ids and the snapshots
+    roster = await users_dal.get_user_list()
+    return await jobs_dal.create_job_doc(date, [user.employeeId for user in roster], roster=roster)
 
 
 @app.post("/api/jobdoc/{date_string}")
@@ -185,14 +471,32 @@ async def update_user_status(date_string: str, user_update_request: list[JobUser
     return await jobs_dal.update_user_status(date_string, user_update_request)
 
 
-async def create_daily_job_doc(users_dal: UserListDAL = Depends(get_users_dal), jobs_dal: JobsDAL = Depends(get_jobs_dal)):
-    print("create_daily_job_doc is triggered")
-    emp_ids = await users_dal.get_user_info({}, {"_id": 0, "employeeId": 1})
-    # get list of employee ids
-    emp_id_list = l2 = [e['employeeId'] for e in emp_ids]
-    print(f"emp_ids: {emp_id_list}")
-    today = datetime.today()
-    return await jobs_dal.create_job_doc(today, emp_id_list)
+JOB_DOC_PREGENERATE_DAYS = _env_int("JOB_DOC_PREGENERATE_DAYS", 7)
+
+
+async def pregenerate_job_docs(days: int = JOB_DOC_PREGENERATE_DAYS) -> JobDocBatchResult:
+    """Create the missing job docs from today to `days - 1` days ahead, from one roster fetch."""
+    users_dal, jobs_dal = await get_users_dal(), make_jobs_dal()
+    today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+    roster = await users_dal.get_user_list()
+    return await jobs_dal.create_job_docs([today + timedelta(days=offset) for offset in range(days)],
+                                          [user.employeeId for user in roster], roster=roster)
+
+
+def make_job_doc_scheduler():
+    """APScheduler job running pregenerate_job_docs now and then on JOB_DOC_SCHEDULE_CRON (00:05 daily)."""
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from apscheduler.triggers.cron import CronTrigger
+
+    scheduler = AsyncIOScheduler()
+    scheduler.add_job(pregenerate_job_docs, CronTrigger.from_crontab(os.environ.get("JOB_DOC_SCHEDULE_CRON", "5 0 * * *")),
+                      next_run_time=datetime.now(), coalesce=True, max_instances=1, misfire_grace_time=3600)
+    return scheduler
+
+
+@app.post("/api/jobdocs/pregenerate")
+async def pregenerate_job_docs_route(days: Annotated[int, Query(ge=1, le=366)] = JOB_DOC_PREGENERATE_DAYS) -> JobDocBatchResult:
+    return await pregenerate_job_docs(days)
 
 
 # change shifts in job doc
@@ -200,15 +504,23 @@ async def create_daily_job_doc(users_dal: UserListDAL = Depends(get_users_dal),
 @app.post("/api/jobdoc/update_shift/{date_string}")
 async def update_shift_details_in_jobdoc(date_string: str, shift_update_reguest: ShiftDetail, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
     return await jobs_dal.update_shift_details_in_jobdoc(date_string, shift_update_reguest)
-    pass
 
 
-@app.get("/api/jobdoc/{date_string}/getEmployeeByShift/{shift}")
-async def get_employee_by_shift(date_string: str, shift: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
+@app.get("/api/jobdoc/{date_string}/getEmployeeByShift/{shift}",
+         response_model=list[EmployeeByShiftResponse] | Page, responses=NDJSON_RESPONSE)
+async def get_employee_by_shift(date_string: str, shift: str, after: str | None = None, limit: PageLimit = None,
+                                fields: str | None = None, list_format: ListFormat = "json",
+                                jobs_dal: JobsDAL = Depends(get_jobs_dal)) -> Response:
+    """Same paging / streaming modes as /api/users."""
+    if list_format != "json" or after is not None or limit is not None or fields is not None:
+        if list_format == "json":
+            limit = limit or DEFAULT_PAGE_SIZE
+        docs = jobs_dal.iter_active_users_by_shift(date_string, shift, _selected_fields(fields, EmployeeByShiftResponse),
+                                                   after=after, limit=limit)
+        return await paged_response(docs, list_format, limit)
     userlist = await jobs_dal.get_active_users_id_by_shift(date_string, shift)
-    # print(userlist)
     userDetailsList = await map_user_details(userlist)
-    return userDetailsList
+    return model_json(EMPLOYEE_LIST, userDetailsList)
 
 
 async def map_user_details(userlist) -> List[EmployeeByShiftResponse]:
@@ -218,51 +530,68 @@ async def map_user_details(userlist) -> List[EmployeeByShiftResponse]:
     return userDetailsList
 
 
-def get_random_x_percent(user_list, percent):
-    sz = int(percent * len(user_list))
-    # print(f"sz: {sz} len: {len(user_list)}")
-    if sz == 0:
-        sz = len(user_list)
-    random_sample = random.sample(user_list, sz)
-    return random_sample
-
-
-def get_random(user_list: List[EmployeeByShiftResponse]):
-    tmp_list: List[EmployeeByShiftResponse] = get_random_x_percent(user_list, 0.4)
-    split = (5 * len(tmp_list)) // 8
-    main_list: List[EmployeeByShiftResponse] = tmp_list[:split]
-    standby_list: List[EmployeeByShiftResponse] = tmp_list[split:]
-    type(main_list)
-    return {"mainList": main_list, "standbyList": standby_list}
-
-
-@app.get("/api/randomizer/{shift}")
-async def get_random_users_by_shift(shift: str, date_string: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)) -> RandomizerResponse1:
-    print(f"invoked !!!!")
-    shift_details = await jobs_dal.get_shift_details_from_job_doc(date_string, shift)
-    print(f"shift_details: {shift_details}")
-    allotted_team = shift_details[shift]
-    user_list = await jobs_dal.get_active_users_id_by_shift(date_string, allotted_team)
-    print(f"allotted_team: {allotted_team}")
-    # print(f"user_list: {user_list}")
-    res = get_random(user_list)
-    final_response = RandomizerResponse1.from_doc(res)
-    await jobs_dal.update_randomizer_run_in_job_doc(final_response,date_string, allotted_team, shift)
-    return final_response
+async def run_randomizer(jobs_dal: JobsDAL, shift: str, date_string: str,
+                         outbox: OutboxDAL | None = None) -> tuple[str, RandomizerResponse1, int]:
+    if shift not in ShiftDetail.model_fields:
+        # the name becomes a $shiftDetail.<shift> path in the roster aggregation
+        raise HTTPException(status_code=404, detail=f"Unknown shift {shift}")
+    # one aggregation for team + active roster, one $push (or outbox insert) for the log entry
+    roster = await jobs_dal.get_shift_roster(date_string, shift)
+    if roster is None:
+        raise HTTPException(status_code=404, detail=f"No job doc for {date_string}")
+    allotted_team = roster.get("allottedTeam")
+    if allotted_team is None:
+        raise HTTPException(status_code=404, detail=f"No team allotted to {shift} on {date_string}")
+    weights = None
+    if randomizer.fairness_days:
+        candidate_ids = [row["users"]["userid"] for row in roster["roster"]]
+        weights = randomizer.weights(await make_history_dal().last_selected(candidate_ids))
+    draw = randomizer.draw(roster["roster"], shift, key=lambda row: row["users"]["userid"], weights=weights)
+    random_response = RandomizerResponse1.from_doc({"mainList": draw.main, "standbyList": draw.standby})
+    log.info("randomizer run", extra={"dateDocId": date_string, "shift": shift, "team": allotted_team,
+                                      "main": len(random_response.mainList),
+                                      "standby": len(random_response.standbyList), "seed": draw.seed})
+    if outbox is not None:
+        log_item = JobsDAL.build_randomizer_log_item(random_response, allotted_team, shift, draw.seed, draw.sampling)
+        await outbox.enqueue(OUTBOX_RANDOMIZER_LOG, {"dateDocId": date_string, "logItem": log_item})
+    else:
+        await jobs_dal.update_randomizer_run_in_job_doc(random_response, date_string, allotted_team, shift,
+                                                        seed=draw.seed, sampling=draw.sampling)
+    return allotted_team, random_response, draw.seed
+
+
+@app.get("/api/randomizer/verify/{date_string}")
+async def verify_randomizer_runs(date_string: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
+    # replays every logged draw of the day from its seed and candidate list
+    runs = []
+    async for doc in jobs_dal.iter_randomizer_logs(date_string, date_string):
+        for index, item in enumerate(doc.get("randomizerLog") or []):
+            if item.get("seed") is None or not item.get("sampling"):
+                runs.append({"index": index, "shift": item.get("shift"), "status": "unverifiable"})
+                continue
+            main_ids, standby_ids = replay(item["sampling"], item["seed"])
+            result = item["randomizerResult"]
+            matches = (main_ids == [person["employeeId"] for person in result["mainList"]]
+                       and standby_ids == [person["employeeId"] for person in result["standbyList"]])
+            runs.append({"index": index, "shift": item["shift"], "seed": item["seed"],
+                         "status": "verified" if matches else "mismatch"})
+    if not runs:
+        raise HTTPException(status_code=404, detail=f"No randomizer runs logged for {date_string}")
+    return {"dateDocId": date_string, "runs": runs}
+
+
+@app.get("/api/randomizer/{shift}", response_model=RandomizerResponse1)
+async def get_random_users_by_shift(shift: str, date_string: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)) -> Response:
+    _, final_response, seed = await run_randomizer(jobs_dal, shift, date_string)
+    return Response(final_response.model_dump_json(), media_type="application/json",
+                    headers={"X-Randomizer-Seed": str(seed)})
 
 
 @app.post("/api/randomizer/send/{shift}")
-async def randomize_and_send(shift: str, date_str: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
-    # get shift details
-    shift_details = await jobs_dal.get_shift_details_from_job_doc(date_str, shift)
-    allotted_team = shift_details[shift]
-    print(f"allotted_team: {allotted_team}")
-    user_list = await jobs_dal.get_active_users_id_by_shift(date_str, allotted_team)
-    res = get_random(user_list)
-    random_response = RandomizerResponse1.from_doc(res)
-
-    # persist the user in the mail_job_doc
-    await jobs_dal.update_randomizer_run_in_job_doc(random_response,date_str, allotted_team, shift)
+async def randomize_and_send(shift: str, date_str: str, jobs_dal: JobsDAL = Depends(get_jobs_dal),
+                             outbox: OutboxDAL | None = Depends(get_outbox_dal)):
+    # pick the users and persist the run in the job doc (queued when the outbox is on)
+    _, random_response, seed = await run_randomizer(jobs_dal, shift, date_str, outbox)
     # send the actual mail
     main_list_mail_ids = []
     standby_list_mail_ids = []
@@ -272,113 +601,162 @@ async def randomize_and_send(shift: str, date_str: str, jobs_dal: JobsDAL = Depe
     for user in random_response.standbyList:
         standby_list_mail_ids.append((user.name, user.email))
 
-    return {"mainList": main_list_mail_ids, "standbyList": standby_list_mail_ids}
-
-
-def send_emails(info: list[tuple[str, str]], type: str):
-    emails = [mail[0] for mail in info]
-    print(f"emails: {emails}")
-    html = ""
-    # change html based on type
-    if type == "main":
-        html = f"<p>Hi! Please be ready for drug test before your shift</p>"
-    elif type == "standby":
-        html = f"<p>Hi! Please be ready for drug test before your shift. Your are part of standby list</p>"
-    params: resend.Emails.SendParams = {
-        "from": "Admin@controltowerdelhi.in",
-        "to": emails,
-        "subject": f"Be sober before shift",
-        "html": html
-    }
-    resend.api_key = get_config()["RESEND_API_KEY"]
-    email = resend.Emails.send(params)
-
-    print(f"email: {email}")
-
-def convert_to_ist_string(dt):
-    ist_offset = timedelta(hours=5, minutes=30)
-    ist_time = dt + ist_offset
-    return ist_time.strftime('%Y-%m-%d %H:%M:%S')
-
-
-def clean_data_for_csv(data):
-    rows = []
-    for entry in data:
-        print(f"entry --> {entry['triggerDateTime']}, type: {type(entry['triggerDateTime'])}")
-        trigger_time = convert_to_ist_string(entry['triggerDateTime'])
-        shift = entry['shift']
-        main_list = entry['randomizerResult'].get('mainList', [])
-        standby_list = entry['randomizerResult'].get('standbyList', [])
-
-        for person in main_list:
-            rows.append({
-                'TriggerDateTime': trigger_time,
-                'Team': shift,
-                'Category': 'Main',
-                **person
-            })
-        for person in standby_list:
-            rows.append({
-                'TriggerDateTime': trigger_time,
-                'Team': shift,
-                'Category': 'Standby',
-                **person
-            })
-            
-        # rows.append(pd.DataFrame([{}]))  # Blank row
-    return rows
+    return {"mainList": main_list_mail_ids, "standbyList": standby_list_mail_ids, "seed": seed}
 
 
-@app.get("/api/generateReport/{date_string}")
-async def generate_report(date_string: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
-    res = await jobs_dal.get_job_doc(date_string)
-    
-    # Use chunks for large datasets
-    log_as_dicts = [item.dict() for item in res.randomizerLog]
-    data = log_as_dicts
-    data = clean_data_for_csv(data)
-    df = pd.DataFrame(data)
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl", mode='w') as writer:
-        df.to_excel(writer, index=False, sheet_name="sheet1")
-    buffer.seek(0)
-    
+async def _prime(aiter):
+    """Pull the first item so emptiness is known before the response starts."""
+    try:
+        first = await anext(aiter)
+    except StopAsyncIteration:
+        return None
+
+    async def chained():
+        yield first
+        async for item in aiter:
+            yield item
+    return chained()
+
+
+def report_response(job_docs, report_format: str, filename: str) -> StreamingResponse:
+    rows = iter_report_rows(job_docs)
     return StreamingResponse(
-        buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=report-{date_string}.xlsx"}
+        REPORT_WRITERS[report_format](rows),
+        media_type=MEDIA_TYPES[report_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{report_format}"}
     )
 
+
+def _validate_date_range(start: str, end: str):
+    try:
+        if datetime.strptime(start, "%Y-%m-%d") > datetime.strptime(end, "%Y-%m-%d"):
+            raise HTTPException(status_code=400, detail="start must not be after end")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD")
+
+
+ReportFormat = Annotated[Literal["xlsx", "csv", "ndjson"], Query(alias="format")]
+
+
+@app.get("/api/generateReport/{date_string}")
+async def generate_report(date_string: str, report_format: ReportFormat = "xlsx",
+                          jobs_dal: JobsDAL = Depends(get_jobs_dal)):
+    job_docs = await _prime(jobs_dal.iter_randomizer_logs(date_string, date_string))
+    if job_docs is None:
+        raise HTTPException(status_code=404, detail=f"No job doc for {date_string}")
+    return report_response(job_docs, report_format, f"report-{date_string}")
+
+
+@app.get("/api/generateReport")
+async def generate_range_report(start: str, end: str, report_format: ReportFormat = "csv",
+                                jobs_dal: JobsDAL = Depends(get_jobs_dal)):
+    _validate_date_range(start, end)
+    job_docs = jobs_dal.iter_randomizer_logs(start, end)
+    return report_response(job_docs, report_format, f"report-{start}-to-{end}")
+
+@app.get("/api/reports/randomizer")
+async def get_randomizer_range_report(start: str, end: str, jobs_dal: JobsDAL = Depends(get_jobs_dal)):
+    _validate_date_range(start, end)
+    groups = await jobs_dal.get_randomizer_summary(start, end)
+    calendar = rotation.team_calendar(date.fromisoformat(start), date.fromisoformat(end))
+    for group in groups:
+        # days the rotation had the team on duty, to compare `days` (days with a run) against
+        group["rosteredDays"] = len({day for day, _ in calendar.get(group["team"], [])})
+    return {"start": start, "end": end, "groups": groups}
+
+
+MAX_CALENDAR_DAYS = 366
+
+
+@app.get("/api/rotation/calendar")
+async def get_rotation_calendar(start: str, end: str, team: str | None = None):
+    """Who works when, from the rotation config alone (no DB): per day, or one team's days and shifts."""
+    _validate_date_range(start, end)
+    first, last = date.fromisoformat(start), date.fromisoformat(end)
+    if (last - first).days >= MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_CALENDAR_DAYS} days per request")
+    if team is not None:
+        days = rotation.team_calendar(first, last).get(team, [])
+        return {"start": start, "end": end, "team": team,
+                "days": [{"date": day.isoformat(), "shift": shift} for day, shift in days]}
+    return {"start": start, "end": end,
+            "days": [{"date": day.isoformat(), "shifts": dict(teams)} for day, teams in rotation.teams_between(first, last)]}
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    return {
+        "roster": roster_cache.to_dict() if roster_cache is not None else None,
+        "jobDocs": job_doc_cache.to_dict() if job_doc_cache is not None else None,
+        "singleFlight": single_flight.to_dict() if single_flight is not None else None,
+    }
+
+
+@lru_cache()
+def get_outbox_worker() -> OutboxWorker:
+    return OutboxWorker(make_outbox_dal(), make_jobs_dal, mail_dispatcher,
+                        batch_size=_env_int("OUTBOX_BATCH_SIZE", 100))
+
+
+@app.get("/api/outbox/stats")
+async def get_outbox_stats():
+    # from the collection: the worker that drained may be another process or Lambda function
+    outbox = make_outbox_dal()
+    return {"queueDepth": await outbox.depth(), "lastCompletedOn": await outbox.last_completed()}
+
+
+@app.post("/api/outbox/drain")
+async def drain_outbox():
+    return await get_outbox_worker().drain(max_seconds=_env_int("OUTBOX_DRAIN_MAX_SECONDS", 20))
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return metrics_registry.to_dict()
+
+
+@app.delete("/api/metrics")
+async def reset_metrics():
+    metrics_registry.reset()
+    return {"status": "reset"}
+
+
 @app.get("/api/health")
 async def get_health():
-    print("aaya hu yha tak dekh")
-    return {"message": "all ok" , "db": get_config()["USER_COLLECTION_NAME"]}
+    return {"message": "all ok" , "db": get_config()["USER_COLLECTION_NAME"], "mongo": await mongo.health()}
 
 
 @app.post("/api/sendmail")
-async def send_mail(response: RandomizerResponse1, shift: str | None = None):
-    # handle main list
-    selected_emails_main = [(user.email, user.name) for user in response.mainList]
-    selected_emails_standBy = [(user.email, user.name) for user in response.standbyList]
-
-    # update daily doc
-    resend_api_key = get_config()["USER_COLLECTION_NAME"]
-    send_mail_by_type(selected_emails_main, "main")
-    send_mail_by_type(selected_emails_standBy, "standby")
-    return {"status": "success"}
-
-def send_mail_by_type(selected_emails, type):
-    batches = [selected_emails[i: i + 50] for i in range(0, len(selected_emails), 50)]
-    for batch in batches:
-        print(f"batch: {batch}")
-        send_emails(batch, type)
+async def send_mail(response: RandomizerResponse1, shift: str | None = None,
+                    outbox: OutboxDAL | None = Depends(get_outbox_dal)) -> DispatchResult | dict:
+    recipients = {
+        "main": [user.email for user in response.mainList],
+        "standby": [user.email for user in response.standbyList],
+    }
+    if outbox is not None:
+        outbox_id = await outbox.enqueue(OUTBOX_EMAIL, {"recipients": recipients, "shift": shift})
+        return {"status": "queued", "id": outbox_id}
+    # main and standby batches go out concurrently, off the event loop
+    return await mail_dispatcher.dispatch(recipients)
 
 
 def main(argv=sys.argv[1:]):
+    import uvicorn
+
     try:
         uvicorn.run("server:app", host="0:0:0:0", port=3001, reload=DEBUG)
     except KeyboardInterrupt:
         pass
 
 
+if EAGER_IMPORTS:
+    # loaded only to have them in sys.modules before the first report / mail request
+    for module in ("openpyxl", "resend"):
+        importlib.import_module(module)
+
+# Mangum runs lifespan per invocation, so on Lambda the pool lives with the container:
+# it is created on first use, or during init (free, boosted CPU) with MONGODB_WARM_ON_INIT.
+if _env_flag("MONGODB_WARM_ON_INIT"):
+    asyncio.get_event_loop().run_until_complete(mongo.warm_up())
+
 handler = Mangum(app=app, lifespan="off")
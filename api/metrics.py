@@ -0,0 +1,251 @@
+"""
+Per-request timing and MongoDB round-trip accounting.
+
+`TimingMiddleware` opens a `RequestStats` for each HTTP request in a context variable.
+`CommandStatsListener`, registered on the Motor client, adds every command's round trip,
+server time and reply size to it. Motor runs pymongo in executor threads under a copy
+of the caller's context, so commands land on the request that issued them. The result
+goes to three places:
+
+- a `Server-Timing` header (`db`, `app`, `cold`) when the response starts;
+- one EMF (CloudWatch embedded metric format) log line per request, which CloudWatch
+  turns into `Latency`, `DbRoundTrips`, `DbTime` and `DbBytesRead` metrics per route;
+- the process-wide `MetricsRegistry`, a latency histogram per route, served at `/api/metrics`.
+
+The header is sent before a streamed body is produced, so for streaming routes it only
+covers the work done up to the first byte; the log line and the registry cover the whole response.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+import bson
+from pymongo import monitoring
+
+from applog import get_logger
+
+log = get_logger("metrics")
+
+# latency histogram bucket upper bounds, milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current: ContextVar[Optional["RequestStats"]] = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.round_trips = 0
+        self.failed = 0
+        self.db_ms = 0.0
+        self.bytes_read = 0
+        # listener callbacks of one request can run on several executor threads at once
+        self._lock = threading.Lock()
+
+    def add_command(self, duration_micros: int, reply_bytes: int, failed: bool = False):
+        with self._lock:
+            self.round_trips += 1
+            self.failed += failed
+            self.db_ms += duration_micros / 1000
+            self.bytes_read += reply_bytes
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    """Adds each command to the RequestStats of the request that issued it (no-op outside requests)."""
+
+    def __init__(self, count_bytes: bool = False):
+        # re-encoding the decoded reply is the only way to size it, so it is opt-in
+        self._count_bytes = count_bytes
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.add_command(event.duration_micros, len(bson.encode(event.reply)) if self._count_bytes else 0)
+
+    def failed(self, event):
+        stats = _current.get()
+        if stats is not None:
+            stats.add_command(event.duration_micros, 0, failed=True)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (the max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.max), 2)
+        return round(self.max, 2)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 2) if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": round(self.max, 2),
+            "buckets": {**{f"le{bound}": count for bound, count in zip(self.bounds, self.counts)},
+                        "inf": self.counts[-1]},
+        }
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.round_trips = 0
+        self.db_failures = 0
+        self.db_ms = 0.0
+        self.bytes_read = 0
+
+    def to_dict(self) -> dict:
+        requests = self.latency.count
+        return {
+            "latencyMs": self.latency.to_dict(),
+            "errors": self.errors,
+            "dbRoundTrips": self.round_trips,
+            "dbRoundTripsPerRequest": round(self.round_trips / requests, 2) if requests else None,
+            "dbFailures": self.db_failures,
+            "dbMs": round(self.db_ms, 2),
+            "dbBytesRead": self.bytes_read,
+        }
+
+
+class MetricsRegistry:
+    """Process-wide (per Lambda container) aggregates, keyed by "METHOD /route/{template}"."""
+
+    def __init__(self):
+        self.routes: dict[str, RouteMetrics] = {}
+        self.started_at = time.time()
+        self.cold_start_ms: Optional[float] = None
+        self.invocations = {"cold": 0, "warm": 0}
+
+    def record(self, route: str, status: int, stats: RequestStats, latency_ms: float):
+        metrics = self.routes.get(route)
+        if metrics is None:
+            metrics = self.routes[route] = RouteMetrics()
+        metrics.latency.observe(latency_ms)
+        metrics.errors += status >= 500
+        metrics.round_trips += stats.round_trips
+        metrics.db_failures += stats.failed
+        metrics.db_ms += stats.db_ms
+        metrics.bytes_read += stats.bytes_read
+
+    def to_dict(self) -> dict:
+        return {
+            "uptimeSeconds": round(time.time() - self.started_at, 1),
+            "invocations": self.invocations,
+            "coldStartMs": self.cold_start_ms,
+            "routes": {route: metrics.to_dict() for route, metrics in sorted(self.routes.items())},
+        }
+
+    def reset(self):
+        self.routes.clear()
+        self.cold_start_ms = None
+        self.invocations = {"cold": 0, "warm": 0}
+
+
+def emf_entry(namespace: str, route: str, cold: bool, status: int, stats: RequestStats, latency_ms: float) -> dict:
+    """`extra` for one EMF log line; JsonFormatter puts these keys at the top level where CloudWatch expects them."""
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [["Route"]],
+                "Metrics": [
+                    {"Name": "Latency", "Unit": "Milliseconds"},
+                    {"Name": "DbRoundTrips", "Unit": "Count"},
+                    {"Name": "DbTime", "Unit": "Milliseconds"},
+                    {"Name": "DbBytesRead", "Unit": "Bytes"},
+                    {"Name": "ColdStart", "Unit": "Count"},
+                ],
+            }],
+        },
+        "Route": route,
+        "Latency": round(latency_ms, 2),
+        "DbRoundTrips": stats.round_trips,
+        "DbTime": round(stats.db_ms, 2),
+        "DbBytesRead": stats.bytes_read,
+        "ColdStart": int(cold),
+        "status": status,
+    }
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware (unlike BaseHTTPMiddleware it does not buffer streamed bodies),
+    so the latency of streaming routes is measured to the last chunk.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, route_name: Callable[[dict], str],
+                 namespace: str = "api", emit_logs: bool = True, process_started: Optional[float] = None):
+        self.app = app
+        self.registry = registry
+        self.route_name = route_name
+        self.namespace = namespace
+        self.emit_logs = emit_logs
+        # time.perf_counter() at import of the app module; the first request reports how long ago that was
+        self.process_started = process_started
+        self._warm = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cold, self._warm = not self._warm, True
+        stats = RequestStats()
+        if cold and self.process_started is not None:
+            self.registry.cold_start_ms = round((stats.started - self.process_started) * 1000, 2)
+        self.registry.invocations["cold" if cold else "warm"] += 1
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed = stats.elapsed_ms()
+                timing = (f'db;dur={stats.db_ms:.1f};desc="{stats.round_trips} round trips", '
+                          f'app;dur={max(elapsed - stats.db_ms, 0):.1f}')
+                if cold:
+                    timing += ', cold;desc="cold start"'
+                message = {**message, "headers": [*message.get("headers", []),
+                                                  (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            latency_ms = stats.elapsed_ms()
+            route = self.route_name(scope)
+            self.registry.record(route, status, stats, latency_ms)
+            if self.emit_logs:
+                log.info("request", extra=emf_entry(self.namespace, route, cold, status, stats, latency_ms))
@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from applog import get_logger
+from dal import JobsDAL
+from mailer import MailDispatcher
+
+OUTBOX_EMAIL = "email"
+OUTBOX_RANDOMIZER_LOG = "randomizer_log"
+
+log = get_logger("outbox")
+
+
+class OutboxDAL:
+    """
+    Durable queue of side effects (emails, randomizer log writes) in a Mongo collection.
+
+    Items move pending -> processing (leased to one worker) -> done, or back to pending
+    with a backoff on failure and to dead after `max_attempts`. A lease that expires
+    (worker killed by a Lambda timeout) makes the item claimable again.
+    """
+
+    def __init__(self, outbox_collection: AsyncIOMotorCollection, lease_seconds: int = 120, max_attempts: int = 5):
+        self._outbox_collection = outbox_collection
+        self._lease_seconds = lease_seconds
+        self._max_attempts = max_attempts
+
+    async def enqueue(self, kind: str, payload: dict, session=None) -> str:
+        return (await self.enqueue_many([(kind, payload)], session=session))[0]
+
+    async def enqueue_many(self, items: list[tuple[str, dict]], session=None) -> list[str]:
+        now = datetime.now()
+        res = await self._outbox_collection.insert_many(
+            [{"kind": kind, "payload": payload, "status": "pending", "attempts": 0,
+              "createdOn": now, "availableAt": now} for kind, payload in items],
+            session=session
+        )
+        return [str(inserted_id) for inserted_id in res.inserted_ids]
+
+    async def claim(self, limit: int) -> list[dict]:
+        now = datetime.now()
+        claimable = {"$or": [
+            {"status": "pending", "availableAt": {"$lte": now}},
+            {"status": "processing", "leaseUntil": {"$lt": now}},
+        ]}
+        candidates = await self._outbox_collection.find(claimable, {"_id": 1}) \
+            .sort("availableAt", 1).limit(limit).to_list(length=limit)
+        if not candidates:
+            return []
+        # re-check the claim condition so concurrent workers never take the same item
+        claim_id = uuid.uuid4().hex
+        await self._outbox_collection.update_many(
+            {"_id": {"$in": [c["_id"] for c in candidates]}, **claimable},
+            {"$set": {"status": "processing", "claimId": claim_id,
+                      "leaseUntil": now + timedelta(seconds=self._lease_seconds)},
+             "$inc": {"attempts": 1}}
+        )
+        return await self._outbox_collection.find({"claimId": claim_id, "status": "processing"}).to_list(length=limit)
+
+    async def complete(self, ids: list, claim_id: str):
+        # only while our lease holds: an item another worker re-claimed is theirs to finish
+        if ids:
+            await self._outbox_collection.update_many(
+                {"_id": {"$in": ids}, "claimId": claim_id, "status": "processing"},
+                {"$set": {"status": "done", "completedOn": datetime.now()}, "$unset": {"leaseUntil": ""}}
+            )
+
+    async def set_payload(self, item_id, payload: dict):
+        await self._outbox_collection.update_one({"_id": item_id}, {"$set": {"payload": payload}})
+
+    async def fail(self, item: dict, error: str):
+        dead = item["attempts"] >= self._max_attempts
+        backoff = timedelta(seconds=min(300, 5 * 2 ** item["attempts"]))
+        await self._outbox_collection.update_one(
+            {"_id": item["_id"], "claimId": item.get("claimId"), "status": "processing"},
+            {"$set": {"status": "dead" if dead else "pending", "lastError": error,
+                      "availableAt": datetime.now() + backoff},
+             "$unset": {"leaseUntil": ""}}
+        )
+
+    async def depth(self) -> dict:
+        counts = {"pending": 0, "processing": 0, "dead": 0}
+        query = self._outbox_collection.aggregate([
+            {"$match": {"status": {"$in": list(counts)}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ])
+        async for row in query:
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    async def last_completed(self) -> Optional[datetime]:
+        """When any worker last finished an item (off the completedOn TTL index)."""
+        doc = await self._outbox_collection.find_one({"completedOn": {"$exists": True}}, {"_id": 0, "completedOn": 1},
+                                                     sort=[("completedOn", -1)])
+        return doc["completedOn"] if doc else None
+
+
+class OutboxWorker:
+    """Drains the outbox in bulk: log entries are grouped into one $push per day, emails run concurrently."""
+
+    def __init__(self, outbox: OutboxDAL, jobs_dal_factory: Callable[[], JobsDAL], mail_dispatcher: MailDispatcher,
+                 batch_size: int = 100):
+        self._outbox = outbox
+        self._jobs_dal_factory = jobs_dal_factory
+        self._mail_dispatcher = mail_dispatcher
+        self._batch_size = batch_size
+
+    async def drain(self, max_seconds: Optional[float] = None) -> dict:
+        start = time.perf_counter()
+        processed = failed = batches = 0
+        while max_seconds is None or time.perf_counter() - start < max_seconds:
+            items = await self._outbox.claim(self._batch_size)
+            if not items:
+                break
+            batches += 1
+            done, failures = await self._process(items)
+            await self._outbox.complete(done, items[0]["claimId"])
+            for item, error in failures:
+                await self._outbox.fail(item, error)
+            processed += len(done)
+            failed += len(failures)
+        elapsed = time.perf_counter() - start
+        result = {
+            "processed": processed,
+            "failed": failed,
+            "batches": batches,
+            "elapsedMs": round(elapsed * 1000, 2),
+            "drainRatePerSecond": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "queueDepth": await self._outbox.depth(),
+            "finishedOn": datetime.now().isoformat(),
+        }
+        if batches:
+            log.info("outbox drain", extra=result)
+        return result
+
+    async def _process(self, items: list[dict]) -> tuple[list, list[tuple[dict, str]]]:
+        done, failures = [], []
+        owners, coroutines = [], []
+
+        log_items_by_date: dict[str, list[dict]] = {}
+        for item in items:
+            if item["kind"] == OUTBOX_RANDOMIZER_LOG:
+                log_items_by_date.setdefault(item["payload"]["dateDocId"], []).append(item)
+            elif item["kind"] == OUTBOX_EMAIL:
+                owners.append([item])
+                coroutines.append(self._send_email(item))
+            else:
+                failures.append((item, f"unknown outbox kind {item['kind']}"))
+
+        jobs_dal = self._jobs_dal_factory()
+        for date_str, date_items in log_items_by_date.items():
+            owners.append(date_items)
+            # with their outbox ids, so a redelivered item is not appended twice
+            coroutines.append(jobs_dal.append_randomizer_logs(
+                date_str, [item["payload"]["logItem"] for item in date_items],
+                outbox_ids=[str(item["_id"]) for item in date_items]))
+
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        for owned, result in zip(owners, results):
+            if isinstance(result, BaseException):
+                failures.extend((item, str(result)) for item in owned)
+            else:
+                done.extend(item["_id"] for item in owned)
+        return done, failures
+
+    async def _send_email(self, item: dict):
+        result = await self._mail_dispatcher.dispatch(item["payload"]["recipients"])
+        if result.failedRecipients:
+            # keep what was sent sent: only the failed recipients are retried with this item
+            await self._outbox.set_payload(item["_id"], {**item["payload"], "recipients": result.failedRecipients})
+            error = next(batch.error for batch in result.batches if batch.status != "sent")
+            raise RuntimeError(f"{result.failed} recipient(s) failed: {error}")
+        return result
+
+    async def run_forever(self, poll_interval: float = 2.0):
+        while True:
+            try:
+                drained = await self.drain()
+                if not drained["processed"] and not drained["failed"]:
+                    await asyncio.sleep(poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("outbox worker error")
+                await asyncio.sleep(poll_interval)
@@ -0,0 +1,83 @@
+"""
+Sampling engine behind the randomizer routes.
+
+Every draw uses its own `random.Random(seed)` over the candidates sorted by employeeId,
+so a run is reproducible from what its log entry stores: the seed, the candidate ids and
+any fairness weights below 1. With fairness on, people selected recently get a lower
+weight (never below `min_weight`) and the draw is a weighted sample without replacement
+(Efraimidis-Spirakis: each candidate keys on u ** (1 / weight), the k largest keys win).
+"""
+import heapq
+import random
+import secrets
+from datetime import datetime
+from typing import Callable, Optional
+
+
+class RandomizerDraw:
+    def __init__(self, main: list, standby: list, seed: int, sampling: dict):
+        self.main = main
+        self.standby = standby
+        self.seed = seed
+        self.sampling = sampling
+
+
+class RandomizerEngine:
+    def __init__(self, fraction: float = 0.4, shift_fractions: Optional[dict[str, float]] = None,
+                 main_share: float = 5 / 8, fairness_days: float = 0, min_weight: float = 0.2):
+        if not 0 < min_weight <= 1:
+            raise ValueError("min_weight must be in (0, 1]")
+        self.fraction = fraction
+        self.shift_fractions = shift_fractions or {}
+        self.main_share = main_share
+        self.fairness_days = fairness_days
+        self.min_weight = min_weight
+
+    def fraction_for(self, shift: str) -> float:
+        return self.shift_fractions.get(shift, self.fraction)
+
+    def weights(self, last_selected: dict[str, datetime], now: Optional[datetime] = None) -> dict[str, float]:
+        """Weight below 1 for everyone selected within `fairness_days`; everyone else weighs 1."""
+        if not self.fairness_days:
+            return {}
+        now = now or datetime.now()
+        weights = {}
+        for employee_id, selected_at in last_selected.items():
+            days = (now - selected_at).total_seconds() / 86400
+            if days < self.fairness_days:
+                weights[employee_id] = round(max(self.min_weight, days / self.fairness_days), 6)
+        return weights
+
+    def draw(self, candidates: list, shift: str, key: Callable[[object], str], weights: Optional[dict[str, float]] = None,
+             seed: Optional[int] = None) -> RandomizerDraw:
+        # 53 bits: the seed travels as a JSON number and must survive a JavaScript client
+        seed = secrets.randbits(53) if seed is None else seed
+        fraction = self.fraction_for(shift)
+        ordered = sorted(candidates, key=key)
+        ids = [key(candidate) for candidate in ordered]
+        # replay decides weighted vs uniform from the stored weights, so must this
+        candidate_weights = {i: weights[i] for i in ids if i in weights} if weights else {}
+        picked = sample(ordered, fraction, seed,
+                        [candidate_weights.get(i, 1.0) for i in ids] if candidate_weights else None)
+        split = int(len(picked) * self.main_share)
+        sampling = {"fraction": fraction, "mainShare": self.main_share, "candidates": ids, "weights": candidate_weights}
+        return RandomizerDraw(picked[:split], picked[split:], seed, sampling)
+
+
+def sample(ordered: list, fraction: float, seed: int, weights: Optional[list[float]] = None) -> list:
+    rng = random.Random(seed)
+    # as before: when the fraction rounds down to nobody, everybody is tested
+    k = int(fraction * len(ordered)) or len(ordered)
+    if not weights:
+        return rng.sample(ordered, k)
+    keys = [rng.random() ** (1 / weight) for weight in weights]
+    return [ordered[i] for i in heapq.nlargest(k, range(len(ordered)), key=keys.__getitem__)]
+
+
+def replay(sampling: dict, seed: int) -> tuple[list[str], list[str]]:
+    """(main ids, standby ids) a logged draw must have produced."""
+    candidates = sampling["candidates"]
+    weights = [sampling["weights"].get(c, 1.0) for c in candidates] if sampling.get("weights") else None
+    picked = sample(candidates, sampling["fraction"], seed, weights)
+    split = int(len(picked) * sampling["mainShare"])
+    return picked[:split], picked[split:]
@@ -0,0 +1,122 @@
+import asyncio
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Iterator
+
+import orjson
+
+REPORT_COLUMNS = ["TriggerDateTime", "Team", "Category", "employeeId", "name", "designation", "email", "phone", "shift"]
+PERSON_COLUMNS = REPORT_COLUMNS[3:]
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# rows buffered per chunk (per worker-thread hop for xlsx)
+ROWS_PER_CHUNK = 500
+XLSX_READ_CHUNK = 64 * 1024
+
+
+def convert_to_ist_string(dt: datetime) -> str:
+    ist_offset = timedelta(hours=5, minutes=30)
+    ist_time = dt + ist_offset
+    return ist_time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def rows_for_log_entry(entry: dict) -> Iterator[list]:
+    """Flatten one randomizerLog entry into report rows (one per selected person)."""
+    trigger_time = convert_to_ist_string(entry['triggerDateTime'])
+    shift = entry['shift']
+    result = entry.get('randomizerResult') or {}
+    for category, list_name in (("Main", "mainList"), ("Standby", "standbyList")):
+        for person in result.get(list_name, []):
+            yield [trigger_time, shift, category, *(person.get(column) for column in PERSON_COLUMNS)]
+
+
+async def iter_report_rows(job_docs: AsyncIterator[dict]) -> AsyncIterator[list]:
+    async for job_doc in job_docs:
+        for entry in job_doc.get('randomizerLog', []):
+            for row in rows_for_log_entry(entry):
+                yield row
+
+
+async def stream_csv(rows: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_COLUMNS)
+    pending = 1
+    async for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= ROWS_PER_CHUNK:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue().encode()
+
+
+async def stream_ndjson(rows: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(dict(zip(REPORT_COLUMNS, row))))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def stream_ndjson_docs(docs: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Any documents as NDJSON, in chunks of ROWS_PER_CHUNK lines as the cursor yields them."""
+    lines = []
+    async for doc in docs:
+        lines.append(orjson.dumps(doc))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def _append_rows(sheet, rows: list[list]):
+    for row in rows:
+        sheet.append(row)
+
+
+async def stream_xlsx(rows: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """
+    Write-only workbook: openpyxl spools each appended row to disk, so memory stays
+    flat however many rows there are. The zip container can only be emitted once the
+    sheet is complete; use csv/ndjson when time-to-first-byte matters.
+    Appending and saving block, so they run in a worker thread, ROWS_PER_CHUNK rows at a time.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("sheet1")
+    pending = [REPORT_COLUMNS]
+    async for row in rows:
+        pending.append(row)
+        if len(pending) >= ROWS_PER_CHUNK:
+            await asyncio.to_thread(_append_rows, sheet, pending)
+            pending = []
+    await asyncio.to_thread(_append_rows, sheet, pending)
+    with tempfile.TemporaryFile() as output:
+        await asyncio.to_thread(workbook.save, output)
+        output.seek(0)
+        while chunk := output.read(XLSX_READ_CHUNK):
+            yield chunk
+
+
+REPORT_WRITERS = {
+    "xlsx": stream_xlsx,
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+}
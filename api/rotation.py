@@ -0,0 +1,141 @@
+"""
+Shift rotation: which team works which shift on a given date, from configuration.
+
+    {
+      "epoch": "2025-01-01",                      # day 0 of every cycle
+      "cycles": {"morning": ["echo", "alpha", ...], "afternoon": [...], "night": [...]},
+      "weekdayTeams": {"general": "general", "ramc": "ramc"},   # working days only
+      "weekendDays": [5, 6],                      # Monday is 0
+      "holidays": ["2025-01-26"],                 # weekday teams are off
+      "overrides": {"2025-03-14": {"morning": "bravo", "ramc": null}}
+    }
+
+Set ROTATION_CONFIG_FILE to a JSON file like this (without the comments); the
+default is the original five-day rotation.
+"""
+import json
+import math
+from datetime import date, datetime
+from itertools import cycle, islice
+from types import MappingProxyType
+from typing import Collection, Mapping, Optional
+
+DEFAULT_ROTATION_CONFIG = {
+    "epoch": "2025-01-01",
+    "cycles": {
+        "morning": ["echo", "alpha", "bravo", "charlie", "delta"],
+        "afternoon": ["delta", "echo", "alpha", "bravo", "charlie"],
+        "night": ["charlie", "delta", "echo", "alpha", "bravo"],
+    },
+    "weekdayTeams": {"general": "general", "ramc": "ramc"},
+    "weekendDays": [5, 6],
+    "holidays": [],
+    "overrides": {},
+}
+
+ShiftTeams = Mapping[str, Optional[str]]
+
+
+def _as_date(day: date) -> date:
+    return day.date() if isinstance(day, datetime) else day
+
+
+class RotationEngine:
+    """
+    Rotating shifts follow their cycle from `epoch`; `weekday_teams` work only on working
+    days (not a weekend day, not a holiday); `overrides` replace shifts on single dates.
+
+    One full period of the cycles (the lcm of their lengths) is precomputed, for working
+    and non-working days, so a lookup is an index into that table plus a set probe, and a
+    range is a walk over the table. The returned mappings are shared and read-only.
+    """
+
+    def __init__(self, epoch: date, cycles: dict[str, list[str]], weekday_teams: Optional[dict[str, str]] = None,
+                 weekend_days=(5, 6), holidays=(), overrides: Optional[dict[date, dict]] = None):
+        if not cycles or any(not teams for teams in cycles.values()):
+            raise ValueError("every rotating shift needs at least one team")
+        weekday_teams = weekday_teams or {}
+        self.shifts = [*cycles, *weekday_teams]
+        self._epoch_ordinal = _as_date(epoch).toordinal()
+        self._weekend_days = frozenset(weekend_days)
+        self._holidays = frozenset(_as_date(day) for day in holidays)
+        self._period = math.lcm(*(len(teams) for teams in cycles.values()))
+        off = dict.fromkeys(weekday_teams)
+        self._table = []
+        for index in range(self._period):
+            rotating = {shift: teams[index % len(teams)] for shift, teams in cycles.items()}
+            self._table.append((MappingProxyType({**rotating, **weekday_teams}), MappingProxyType({**rotating, **off})))
+        self._overrides = {}
+        for day, shifts in (overrides or {}).items():
+            day = _as_date(day)
+            unknown = set(shifts) - set(self.shifts)
+            if unknown:
+                raise ValueError(f"override for {day} names unknown shift(s) {', '.join(sorted(unknown))}")
+            self._overrides[day] = MappingProxyType({**self._scheduled(day), **shifts})
+
+    @classmethod
+    def from_config(cls, config: dict, shifts: Optional[Collection[str]] = None) -> "RotationEngine":
+        """`shifts`, when given, are the only shift names the config may use (cycles, weekday teams, overrides)."""
+        engine = cls(
+            epoch=date.fromisoformat(config["epoch"]),
+            cycles=config["cycles"],
+            weekday_teams=config.get("weekdayTeams"),
+            weekend_days=config.get("weekendDays", (5, 6)),
+            holidays=[date.fromisoformat(day) for day in config.get("holidays", [])],
+            overrides={date.fromisoformat(day): shifts for day, shifts in config.get("overrides", {}).items()},
+        )
+        # overrides are already checked against engine.shifts
+        unknown = set(engine.shifts) - set(shifts) if shifts is not None else set()
+        if unknown:
+            raise ValueError(f"rotation names unknown shift(s) {', '.join(sorted(unknown))}")
+        return engine
+
+    def is_working_day(self, day: date) -> bool:
+        day = _as_date(day)
+        return day.weekday() not in self._weekend_days and day not in self._holidays
+
+    def _scheduled(self, day: date) -> ShiftTeams:
+        working, off = self._table[(day.toordinal() - self._epoch_ordinal) % self._period]
+        return working if self.is_working_day(day) else off
+
+    def teams_on(self, day: date) -> ShiftTeams:
+        day = _as_date(day)
+        override = self._overrides.get(day)
+        return override if override is not None else self._scheduled(day)
+
+    def teams_between(self, start: date, end: date) -> list[tuple[date, ShiftTeams]]:
+        """Every day from `start` to `end` inclusive, walking the table from start's position."""
+        start, end = _as_date(start), _as_date(end)
+        days = (end - start).days + 1
+        if days <= 0:
+            return []
+        first = (start.toordinal() - self._epoch_ordinal) % self._period
+        rows = islice(cycle(self._table[first:] + self._table[:first]), days)
+        result = []
+        for ordinal, (working, off) in zip(range(start.toordinal(), start.toordinal() + days), rows):
+            day = date.fromordinal(ordinal)
+            override = self._overrides.get(day)
+            if override is not None:
+                result.append((day, override))
+            else:
+                result.append((day, working if self.is_working_day(day) else off))
+        return result
+
+    def team_calendar(self, start: date, end: date) -> dict[str, list[tuple[date, str]]]:
+        """team -> the (day, shift) pairs it works between `start` and `end`."""
+        calendar: dict[str, list[tuple[date, str]]] = {}
+        for day, teams in self.teams_between(start, end):
+            for shift, team in teams.items():
+                if team is not None:
+                    calendar.setdefault(team, []).append((day, shift))
+        return calendar
+
+
+def load_rotation(path: Optional[str] = None, shifts: Optional[Collection[str]] = None) -> RotationEngine:
+    if not path:
+        return DEFAULT_ROTATION
+    with open(path) as f:
+        return RotationEngine.from_config(json.load(f), shifts=shifts)
+
+
+DEFAULT_ROTATION = RotationEngine.from_config(DEFAULT_ROTATION_CONFIG)
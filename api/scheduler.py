@@ -0,0 +1,38 @@
+"""
+Job doc pre-generation entry point.
+
+Deploy as another handler of the same Lambda package (`scheduler.handler`) on a daily
+EventBridge schedule (the event may carry {"days": N}), or locally run
+`python scheduler.py` once, `python scheduler.py --serve` to keep the daily
+APScheduler job running, or set JOB_DOC_SCHEDULER=true on the uvicorn server.
+"""
+import asyncio
+import sys
+
+from main import JOB_DOC_PREGENERATE_DAYS, make_job_doc_scheduler, pregenerate_job_docs
+
+
+def handler(event, context):
+    days = int((event or {}).get("days", JOB_DOC_PREGENERATE_DAYS))
+    # same loop Mangum uses, so the pooled Motor client stays bound to it
+    result = asyncio.get_event_loop().run_until_complete(pregenerate_job_docs(days))
+    return result.model_dump()
+
+
+async def serve():
+    make_job_doc_scheduler().start()
+    await asyncio.Event().wait()
+
+
+def main(argv=sys.argv[1:]):
+    try:
+        if "--serve" in argv:
+            asyncio.run(serve())
+        else:
+            print(asyncio.run(pregenerate_job_docs()).model_dump_json())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
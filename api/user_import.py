@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+from typing import Optional
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from dal import UserRequest
+
+IMPORT_FORMATS = ("csv", "xlsx", "json")
+USER_FIELDS = list(UserRequest.model_fields)
+
+_USER_ROWS = TypeAdapter(list[UserRequest])
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+class ImportRowResult(BaseModel):
+    row: int
+    employeeId: Optional[str] = None
+    status: str
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ImportResult(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    rows: list[ImportRowResult]
+
+
+def detect_format(filename: str | None, content_type: str | None) -> str:
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    if extension in IMPORT_FORMATS:
+        return extension
+    content_type = (content_type or "").lower()
+    if "json" in content_type:
+        return "json"
+    if "spreadsheetml" in content_type:
+        return "xlsx"
+    if "csv" in content_type:
+        return "csv"
+    raise ImportFormatError(f"cannot tell the format of {filename or 'the upload'}; pass format=csv|xlsx|json")
+
+
+def _cell(value) -> str | None:
+    # spreadsheets hand back phone numbers / ids as numbers
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    # a blank cell is a missing value, so the row fails validation instead of importing ""
+    return str(value).strip() or None
+
+
+def _rows_from_table(header: list, records) -> list[dict]:
+    columns = [str(column).strip() if column is not None else "" for column in header]
+    missing = [field for field in USER_FIELDS if field not in columns]
+    if missing:
+        raise ImportFormatError(f"missing column(s): {', '.join(missing)}")
+    return [{column: _cell(value) for column, value in zip(columns, record) if column in USER_FIELDS}
+            for record in records if any(value not in (None, "") for value in record)]
+
+
+def parse_rows(data: bytes, import_format: str) -> list[dict]:
+    """Raw row dicts in file order; the header row / object keys must name the UserRequest fields."""
+    if import_format == "json":
+        try:
+            rows = json.loads(data)
+        except ValueError as e:
+            raise ImportFormatError(f"invalid JSON: {e}") from e
+        if not isinstance(rows, list):
+            raise ImportFormatError("expected a JSON array of users")
+        return [{k: _cell(v) for k, v in row.items()} if isinstance(row, dict) else row for row in rows]
+    if import_format == "csv":
+        reader = csv.reader(io.StringIO(data.decode("utf-8-sig")))
+        header = next(reader, None)
+        if header is None:
+            return []
+        return _rows_from_table(header, reader)
+    if import_format == "xlsx":
+        from openpyxl import load_workbook
+
+        try:
+            workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFormatError(f"invalid xlsx: {e}") from e
+        records = workbook.active.iter_rows(values_only=True)
+        header = next(records, None)
+        rows = _rows_from_table(list(header), records) if header is not None else []
+        workbook.close()
+        return rows
+    raise ImportFormatError(f"unsupported format {import_format}")
+
+
+def validate_rows(rows: list) -> tuple[list[tuple[int, UserRequest]], list[ImportRowResult]]:
+    """
+    Validate every row in one pass; returns (row number, user) for the valid rows and a
+    result for each invalid one. Row numbers are 1-based data rows. A repeated employeeId
+    keeps its first row.
+    """
+    errors: dict[int, list[str]] = {}
+    try:
+        users = _USER_ROWS.validate_python(rows)
+    except ValidationError as e:
+        for error in e.errors():
+            index = error["loc"][0]
+            field = ".".join(str(part) for part in error["loc"][1:])
+            errors.setdefault(index, []).append(f"{field}: {error['msg']}" if field else error["msg"])
+        # second pass over what is left; it cannot fail
+        valid_indexes = [i for i in range(len(rows)) if i not in errors]
+        users = dict(zip(valid_indexes, _USER_ROWS.validate_python([rows[i] for i in valid_indexes])))
+    else:
+        users = dict(enumerate(users))
+
+    valid, invalid, seen = [], [], set()
+    for index in range(len(rows)):
+        row_number = index + 1
+        if index in errors:
+            employee_id = rows[index].get("employeeId") if isinstance(rows[index], dict) else None
+            invalid.append(ImportRowResult(row=row_number, employeeId=employee_id, status="invalid",
+                                           error="; ".join(errors[index])))
+        elif users[index].employeeId in seen:
+            invalid.append(ImportRowResult(row=row_number, employeeId=users[index].employeeId, status="invalid",
+                                           error="duplicate employeeId in upload"))
+        else:
+            seen.add(users[index].employeeId)
+            valid.append((row_number, users[index]))
+    return valid, invalid
@@ -0,0 +1,30 @@
+"""
+Outbox worker entry point.
+
+Deploy as a second handler of the same Lambda package (`worker.handler`) on an
+EventBridge schedule, or run `python worker.py` next to a local server.
+"""
+import asyncio
+import sys
+
+from main import get_outbox_worker
+
+
+def handler(event, context):
+    # leave headroom to mark the last batch done before the invocation times out
+    max_seconds = None
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        max_seconds = max(1.0, context.get_remaining_time_in_millis() / 1000 - 10)
+    # same loop Mangum uses, so the pooled Motor client stays bound to it
+    return asyncio.get_event_loop().run_until_complete(get_outbox_worker().drain(max_seconds=max_seconds))
+
+
+def main(argv=sys.argv[1:]):
+    try:
+        asyncio.run(get_outbox_worker().run_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
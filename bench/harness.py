@@ -0,0 +1,263 @@
+"""
+Load test of every read route and the randomizer, per roster size, in-process.
+
+Each route is driven through the FastAPI app over httpx's ASGITransport (with
+`--concurrency` requests in flight) and, one request at a time as on Lambda, through the
+Mangum `handler` with synthetic API Gateway (REST, proxy) events. The database is
+mongomock-motor, or a local mongod when MONGODB_URI is set (its bench collections are
+dropped and re-seeded). For each size the seed is `--days` job docs ending on 2025-03-03,
+every employee active, each doc holding `--log-entries` randomizer runs.
+
+    python bench/harness.py --sizes 100,1000 --requests 50
+    MONGODB_URI=mongodb://localhost:27017/bench python bench/harness.py --sizes 100,1000,10000
+
+Reported per size, transport and route: requests, errors, throughput and p50/p95/p99 in
+ms (`--route-seconds` cuts a slow route short). `--json` writes the same as a file; `--baseline` compares p95s with an earlier
+`--json` file and exits 1 when one is more than `--tolerance` times slower (CI runs this
+with bench/baseline.json). mongomock evaluates `$lookup` by scanning, so the roster
+routes grow quadratically there; use mongod for 10k rosters. The app's in-process caches
+stay on, as in a warm container: the first request of a route pays the miss.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+# a real mongod only when asked for; otherwise mongomock-motor under the same name
+MONGOD_URI = os.environ.get("MONGODB_URI")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/bench")
+os.environ.setdefault("USER_DB_COLLECTION_NAME", "bench_users")
+os.environ.setdefault("JOB_COLLECTION_NAME", "bench_daily_jobs")
+os.environ.setdefault("RESEND_API_KEY", "unused")
+# one EMF line per request would drown the report
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main as api  # noqa: E402
+from dal import EmployeeByShiftResponse, JobsDAL, RandomizerResponse1  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+END_DATE = datetime(2025, 3, 3)
+TEAMS = ["alpha", "bravo", "charlie", "delta", "echo"]
+TRANSPORTS = ("asgi", "mangum")
+
+
+def routes(date_str: str, start_str: str, employee_id: str, team: str) -> list[tuple[str, str, dict]]:
+    """(label, path, query) for each benchmarked route."""
+    return [
+        ("users", "/api/users", {}),
+        ("users page", "/api/users", {"limit": 100}),
+        ("job doc", f"/api/jobdoc/{date_str}", {}),
+        ("employees by shift", f"/api/jobdoc/{date_str}/getEmployeeByShift/{team}", {}),
+        ("randomizer report", "/api/reports/randomizer", {"start": start_str, "end": date_str}),
+        ("csv report", "/api/generateReport", {"start": start_str, "end": date_str, "format": "csv"}),
+        ("selections", f"/api/users/{employee_id}/selections", {}),
+        ("rotation calendar", "/api/rotation/calendar", {"start": start_str, "end": date_str}),
+        # last: every run appends to the job doc log
+        ("randomizer", "/api/randomizer/morning", {"date_string": date_str}),
+    ]
+
+
+def connect():
+    if MONGOD_URI:
+        return "mongod"
+    from mongomock_motor import AsyncMongoMockClient
+
+    client = AsyncMongoMockClient()
+    # mongomock-motor's get_default_database returns the unwrapped (sync) database
+    client.get_default_database = lambda: client["bench"]
+    api.mongo.use_client(client)
+    return "mongomock"
+
+
+def log_entries(employee_ids: list[str], count: int) -> list[dict]:
+    entries = []
+    for i in range(count):
+        picked = [employee_ids[(i * 7 + j) % len(employee_ids)] for j in range(8)]
+        people = [EmployeeByShiftResponse.model_construct(employeeId=e, name=f"Employee {e}", designation="ATCO",
+                                                          email=f"employee{e}@example.com", phone="9999999999",
+                                                          shift="alpha") for e in picked]
+        response = RandomizerResponse1.model_construct(mainList=people[:5], standbyList=people[5:])
+        entries.append(JobsDAL.build_randomizer_log_item(response, "alpha", "morning"))
+    return entries
+
+
+async def seed(db, size: int, days: int, entries: int) -> list[str]:
+    names = api.collection_names()
+    for name in names.values():
+        await db.drop_collection(name)
+    await ensure_indexes(db, names)
+    employee_ids = [f"{i:05d}" for i in range(size)]
+    await db[names["users"]].insert_many(
+        [{"employeeId": e, "name": f"Employee {e}", "designation": "ATCO", "email": f"employee{e}@example.com",
+          "phone": f"98{i:08d}", "shift": TEAMS[i % len(TEAMS)]} for i, e in enumerate(employee_ids)])
+    jobs_dal = api.make_jobs_dal()
+    dates = [END_DATE - timedelta(days=d) for d in range(days)]
+    await jobs_dal.create_job_docs(dates, employee_ids)
+    log = log_entries(employee_ids, entries)
+    for day in dates:
+        await db[names["jobs"]].update_one({"dateDocId": day.strftime("%Y-%m-%d")}, {"$set": {"randomizerLog": log}})
+    if api.roster_cache is not None:
+        api.roster_cache.invalidate()
+    if api.job_doc_cache is not None:
+        api.job_doc_cache.clear()
+    return employee_ids
+
+
+def summarize(latencies: list[float], errors: int, wall_seconds: float) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall_seconds, 1) if wall_seconds else None,
+        "p50": round(cuts[49], 2),
+        "p95": round(cuts[94], 2),
+        "p99": round(cuts[98], 2),
+    }
+
+
+async def drive_asgi(path: str, query: dict, requests: int, concurrency: int, budget: float) -> dict:
+    latencies, errors = [], 0
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def one():
+            nonlocal errors
+            start = time.perf_counter()
+            response = await client.get(path, params=query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+        wall = time.perf_counter()
+        for offset in range(0, requests, concurrency):
+            await asyncio.gather(*(one() for _ in range(min(concurrency, requests - offset))))
+            if time.perf_counter() - wall > budget:
+                break
+        return summarize(latencies, errors, time.perf_counter() - wall)
+
+
+def api_gateway_event(path: str, query: dict) -> dict:
+    params = {key: str(value) for key, value in query.items()} or None
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"Host": "bench.execute-api.local", "Accept": "application/json"},
+        "multiValueHeaders": {"Host": ["bench.execute-api.local"], "Accept": ["application/json"]},
+        "queryStringParameters": params,
+        "multiValueQueryStringParameters": {key: [value] for key, value in params.items()} if params else None,
+        "pathParameters": {"proxy": path.lstrip("/")},
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": "/{proxy+}",
+            "httpMethod": "GET",
+            "path": f"/prod{path}",
+            "stage": "prod",
+            "requestId": str(uuid.uuid4()),
+            "identity": {"sourceIp": "127.0.0.1", "userAgent": "bench"},
+        },
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+def drive_mangum(path: str, query: dict, requests: int, budget: float) -> dict:
+    # sync, like the Lambda runtime: Mangum runs the app on the thread's event loop
+    latencies, errors = [], 0
+    wall = time.perf_counter()
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = api.handler(api_gateway_event(path, query), {})
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += response["statusCode"] >= 400
+        if time.perf_counter() - wall > budget:
+            break
+    return summarize(latencies, errors, time.perf_counter() - wall)
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list[str]:
+    regressions = []
+    if baseline.get("backend") != report["backend"]:
+        print(f"# baseline is from {baseline.get('backend')}, not compared")
+        return regressions
+    for key, result in report["results"].items():
+        before = baseline.get("results", {}).get(key)
+        # sub-millisecond routes jump several-fold on a GC pause; a regression must also cost min_delta_ms
+        if before and result["p95"] > max(before["p95"] * tolerance, before["p95"] + min_delta_ms):
+            regressions.append(f"{key}: p95 {result['p95']}ms vs baseline {before['p95']}ms")
+    return regressions
+
+
+def run(args) -> int:
+    # one loop for seeding, the ASGI runs and Mangum, so a real Motor client stays bound to it
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    backend = connect()
+    db = api.mongo.get_database()
+    report = {"backend": backend, "requests": args.requests, "concurrency": args.concurrency,
+              "logEntries": args.log_entries, "days": args.days, "results": {}}
+    date_str = END_DATE.strftime("%Y-%m-%d")
+    start_str = (END_DATE - timedelta(days=args.days - 1)).strftime("%Y-%m-%d")
+    team = api.rotation.teams_on(END_DATE)["morning"]
+    print(f"backend={backend} requests={args.requests} concurrency={args.concurrency} "
+          f"days={args.days} log_entries={args.log_entries}")
+    print(f"{'size':>6} {'transport':<9} {'route':<20} {'n':>5} {'err':>4} {'req/s':>8} "
+          f"{'p50':>9} {'p95':>9} {'p99':>9}")
+    for size in args.sizes:
+        for transport in args.transports:
+            # fresh data per transport: the randomizer runs grow the logs the other routes read
+            start = time.perf_counter()
+            employee_ids = loop.run_until_complete(seed(db, size, args.days, args.log_entries))
+            print(f"# seeded {size} employees in {time.perf_counter() - start:.1f}s")
+            for label, path, query in routes(date_str, start_str, employee_ids[0], team):
+                if transport == "asgi":
+                    result = loop.run_until_complete(drive_asgi(path, query, args.requests, args.concurrency,
+                                                                args.route_seconds))
+                else:
+                    result = drive_mangum(path, query, args.requests, args.route_seconds)
+                report["results"][f"{size}/{transport}/{label}"] = result
+                print(f"{size:>6} {transport:<9} {label:<20} {result['requests']:>5} {result['errors']:>4} "
+                      f"{result['rps']:>8} {result['p50']:>9} {result['p95']:>9} {result['p99']:>9}")
+    api.mongo.close()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        errors = [key for key, result in report["results"].items() if result["errors"]]
+        for key in errors:
+            print(f"ERRORS {key}")
+        return 1 if regressions or errors else 0
+    return 0
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")], default=[100, 1000])
+    parser.add_argument("--requests", type=int, default=50, help="per route, size and transport")
+    parser.add_argument("--concurrency", type=int, default=4, help="ASGI requests in flight")
+    parser.add_argument("--route-seconds", type=float, default=float("inf"),
+                        help="stop a route early once it has run this long")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--log-entries", type=int, default=200, help="randomizer runs per job doc")
+    parser.add_argument("--transports", type=lambda value: value.split(","), default=list(TRANSPORTS))
+    parser.add_argument("--json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=3.0)
+    parser.add_argument("--min-delta-ms", type=float, default=5.0)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Cold-start import budget for the Lambda handler.
+
+Imports `main` in a fresh interpreter under `python -X importtime` several times,
+reports p50/p99 of the cumulative import time and exits non-zero when the p99 is
+over budget or when a dependency that should load lazily was pulled in eagerly.
+
+    python bench/import_time.py --runs 20 --budget-ms 900
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+
+# only needed by the report / mail routes and the local dev server
+LAZY_MODULES = ["pandas", "openpyxl", "resend", "uvicorn"]
+
+
+def measure_once(module: str) -> int:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=API_DIR, capture_output=True, text=True, check=True,
+    )
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    raise RuntimeError(f"no importtime entry for {module}")
+
+
+def eagerly_loaded(module: str) -> list[str]:
+    check = f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", check], cwd=API_DIR, capture_output=True, text=True, check=True)
+    out = proc.stdout.strip()
+    return out.split(",") if out else []
+
+
+def percentile(samples: list[int], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("IMPORT_BUDGET_MS", 900)))
+    args = parser.parse_args(argv)
+
+    samples = [measure_once(args.module) for _ in range(args.runs)]
+    p50 = statistics.median(samples) / 1000
+    p99 = percentile(samples, 99) / 1000
+    print(f"import {args.module}: runs={args.runs} p50={p50:.1f}ms p99={p99:.1f}ms budget={args.budget_ms:.0f}ms")
+
+    failed = False
+    eager = eagerly_loaded(args.module)
+    if eager:
+        print(f"FAIL: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if p99 > args.budget_ms:
+        print(f"FAIL: p99 {p99:.1f}ms over budget {args.budget_ms:.0f}ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Write amplification and latency of job-doc array appends versus document size.
+
+Compares the old `$concatArrays` + `$merge` aggregation against the in-place
+`$push`/`$each` path of JobsDAL for job docs that already hold N randomizer runs.
+Needs a real mongod (mongomock has no `$merge`); point MONGODB_URI at a scratch
+database, it is dropped and re-seeded:
+
+    MONGODB_URI=mongodb://localhost:27017/bench python bench/job_doc_writes.py --sizes 10 100 1000
+
+"Bytes written" is the size of the oplog entry when the server is a replica set
+(exact), otherwise the BSON size of what each strategy sends to storage: the full
+document for `$merge`, the appended element for `$push`.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from dal import JobsDAL  # noqa: E402
+
+COLLECTION = "bench_daily_jobs"
+
+
+def log_item(i: int) -> dict:
+    person = {"employeeId": f"{i:05d}", "name": f"Employee {i}", "designation": "ATCO",
+              "email": f"employee{i}@example.com", "phone": "9999999999", "shift": "alpha"}
+    return {"triggerDateTime": datetime.now(), "shift": "morning", "allotedTeam": "alpha",
+            "randomizerResult": {"mainList": [person] * 5, "standbyList": [person] * 3}}
+
+
+async def legacy_append(collection, date_str: str, item: dict):
+    await collection.aggregate([
+        {'$match': {'dateDocId': date_str}},
+        {'$set': {'randomizerLog': {'$concatArrays': ['$randomizerLog', [item]]}}},
+        {'$merge': {'into': COLLECTION, 'whenMatched': 'merge'}},
+    ]).to_list(length=None)
+
+
+async def push_append(jobs_dal: JobsDAL, date_str: str, item: dict):
+    await jobs_dal.push_to_job_doc(date_str, "randomizerLog", [item])
+
+
+async def oplog_bytes(client, since) -> int | None:
+    try:
+        entries = client.local["oplog.rs"].find({"ns": f"{client.get_default_database().name}.{COLLECTION}",
+                                                 "ts": {"$gt": since}})
+        return sum([len(bson.encode(e)) async for e in entries])
+    except Exception:
+        return None
+
+
+async def last_oplog_ts(client):
+    try:
+        entry = await client.local["oplog.rs"].find_one(sort=[("$natural", -1)])
+        return entry["ts"] if entry else None
+    except Exception:
+        return None
+
+
+async def run_size(client, collection, jobs_dal, size: int, appends: int) -> dict:
+    results = {}
+    for name in ("merge", "push"):
+        date_str = f"bench-{name}-{size}"
+        await collection.delete_many({"dateDocId": date_str})
+        await collection.insert_one({"dateDocId": date_str, "users": [], "randomizerLog": [log_item(i) for i in range(size)]})
+        doc_bytes = len(bson.encode(await collection.find_one({"dateDocId": date_str})))
+
+        since = await last_oplog_ts(client)
+        timings = []
+        for i in range(appends):
+            item = log_item(size + i)
+            start = time.perf_counter()
+            if name == "merge":
+                await legacy_append(collection, date_str, item)
+            else:
+                await push_append(jobs_dal, date_str, item)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        item_bytes = len(bson.encode(log_item(0)))
+        written = await oplog_bytes(client, since) if since is not None else None
+        if written is None:
+            written = appends * (doc_bytes if name == "merge" else item_bytes)
+        results[name] = {
+            "p50": statistics.median(timings),
+            "p95": sorted(timings)[int(0.95 * (len(timings) - 1))],
+            "amplification": written / (appends * item_bytes),
+            "doc_kb": doc_bytes / 1024,
+        }
+    return results
+
+
+async def run(sizes: list[int], appends: int):
+    client = AsyncIOMotorClient(os.environ["MONGODB_URI"])
+    db = client.get_default_database()
+    collection = db[COLLECTION]
+    await collection.drop()
+    jobs_dal = JobsDAL(collection)
+
+    print(f"{'log size':>9} {'doc KB':>8} | {'merge p50':>9} {'p95':>7} {'amp':>7} | {'push p50':>9} {'p95':>7} {'amp':>5}")
+    for size in sizes:
+        r = await run_size(client, collection, jobs_dal, size, appends)
+        m, p = r["merge"], r["push"]
+        print(f"{size:>9} {m['doc_kb']:>8.1f} | {m['p50']:>7.2f}ms {m['p95']:>5.2f}ms {m['amplification']:>6.1f}x"
+              f" | {p['p50']:>7.2f}ms {p['p95']:>5.2f}ms {p['amplification']:>4.1f}x")
+    await collection.drop()
+    client.close()
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--appends", type=int, default=50)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.sizes, args.appends))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Per-request logging cost for a 2,000-employee roster, print() per document vs applog.
+
+"before" replays the old DAL behaviour (print every user document on a roster load,
+print the whole result of get_user_info, print the full job doc in JobDocument.from_doc);
+"after" runs the current DAL code with LOG_LEVEL=INFO and with DEBUG sampled. Output
+goes to a line-buffered file, like the pipe CloudWatch reads on Lambda.
+
+    python bench/logging_cost.py --employees 2000 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from applog import configure_logging  # noqa: E402
+from dal import JobDocument, User, UserListDAL  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for doc in self._docs:
+            yield doc
+
+    async def to_list(self, length=None):
+        return list(self._docs)
+
+
+class FakeUserCollection:
+    name = "users"
+
+    def __init__(self, docs):
+        self._docs = docs
+
+    def find(self, *args, **kwargs):
+        return FakeCursor(self._docs)
+
+
+class PrintingUserListDAL(UserListDAL):
+    """The DAL as it was: one print per document."""
+
+    def __init__(self, user_collection):
+        print(user_collection.name)
+        super().__init__(user_collection)
+
+    async def _load_user_list(self, session=None):
+        user_list = []
+        async for user in self._user_collection.find({}):
+            print(user)
+            user_list.append(User.from_doc(user))
+        return user_list
+
+    async def get_user_info(self, query_filter, projection_filter=None):
+        print(f"query : {query_filter}, projection: {projection_filter}")
+        ans = await self._user_collection.find(query_filter, projection_filter).to_list(length=None)
+        print(f"Ans: {ans}")
+        return ans
+
+
+def printing_job_doc_from_doc(doc):
+    print(f"doc -> {doc}")
+    return JobDocument.from_doc(doc)
+
+
+def make_docs(n: int):
+    users = [{"_id": f"{i:024x}", "employeeId": f"{i:04d}", "name": f"Employee {i}", "designation": "ATCO",
+              "email": f"employee{i}@example.com", "phone": f"98{i:08d}", "shift": "alpha bravo".split()[i % 2]}
+             for i in range(n)]
+    job_doc = {"_id": "0" * 24, "dateDocId": "2025-01-01", "prevDocId": "", "createdOn": datetime(2025, 1, 1),
+               "shiftDetail": {"morning": "alpha", "afternoon": "bravo", "night": "charlie",
+                               "general": "general", "ramc": "ramc"},
+               "users": [{"userid": u["employeeId"], "status": True} for u in users], "randomizerLog": []}
+    return users, job_doc
+
+
+async def one_request(make_dal, job_doc_from_doc, users, job_doc):
+    dal = make_dal(FakeUserCollection(users))
+    await dal.get_user_list()
+    await dal.get_user_info({"shift": "alpha"})
+    job_doc_from_doc(job_doc)
+
+
+async def measure(label, make_dal, job_doc_from_doc, users, job_doc, requests, out):
+    timings = []
+    size_before = os.fstat(out.fileno()).st_size
+    with redirect_stdout(out):
+        for _ in range(requests):
+            start = time.perf_counter()
+            await one_request(make_dal, job_doc_from_doc, users, job_doc)
+            timings.append((time.perf_counter() - start) * 1000)
+    out.flush()
+    written = (os.fstat(out.fileno()).st_size - size_before) / requests
+    print(f"{label:<28} p50={statistics.median(timings):8.2f}ms  max={max(timings):8.2f}ms"
+          f"  log_bytes/request={written:>10,.0f}")
+
+
+async def run(args):
+    users, job_doc = make_docs(args.employees)
+    with tempfile.NamedTemporaryFile("w", buffering=1, suffix=".log") as out:
+        await measure("before: print per document", PrintingUserListDAL, printing_job_doc_from_doc,
+                      users, job_doc, args.requests, out)
+        configure_logging("INFO", 1.0, stream=out)
+        await measure("after: INFO", UserListDAL, JobDocument.from_doc, users, job_doc, args.requests, out)
+        configure_logging("DEBUG", 0.1, stream=out)
+        await measure("after: DEBUG, 10% sampled", UserListDAL, JobDocument.from_doc,
+                      users, job_doc, args.requests, out)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
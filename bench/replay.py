@@ -0,0 +1,150 @@
+"""
+Replay captured traffic (api/capture.py) against the app, faster or slower than it came.
+
+Requests keep their original spacing divided by `--speedup` (0 = back to back), with at
+most `--concurrency` in flight, so a morning-shift randomizer burst arrives as a burst.
+Lines may be raw capture lines or `api.capture` log records exported from CloudWatch.
+Only GET/HEAD requests are replayed unless `--methods` says otherwise; writes need their
+bodies, captured with CAPTURE_BODIES.
+
+    CAPTURE_ENABLED=true uvicorn main:app ...           # record, into api/captures.jsonl
+    python bench/replay.py api/captures.jsonl --url http://localhost:3001 --speedup 10
+    python bench/replay.py api/captures.jsonl --seed 1000 --concurrency 32
+
+Without `--url` the app runs in-process on mongomock-motor (or MONGODB_URI), set up as by
+bench/harness.py; `--seed N` loads its synthetic roster first. Reported per route: count,
+errors, p50/p95/p99 against the captured p50, and how far the replay fell behind schedule.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import sys
+import time
+
+import httpx
+
+
+def load(paths: list[str], methods: set[str], limit: int | None) -> list[dict]:
+    entries = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if "method" in entry and "path" in entry and entry["method"] in methods:
+                    entries.append(entry)
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries[:limit] if limit else entries
+
+
+def percentiles(values: list[float]) -> tuple[float, float, float]:
+    if len(values) == 1:
+        return (round(values[0], 2),) * 3
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return round(cuts[49], 2), round(cuts[94], 2), round(cuts[98], 2)
+
+
+async def replay(client: httpx.AsyncClient, entries: list[dict], speedup: float, concurrency: int) -> tuple[list, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    first_ts = entries[0]["ts"]
+    started = time.perf_counter()
+
+    async def one(entry: dict):
+        due = (entry["ts"] - first_ts) / speedup if speedup else 0.0
+        delay = due - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            # lag: how much later than scheduled the request actually went out
+            lag = (time.perf_counter() - started - due) * 1000
+            body = base64.b64decode(entry["body"]) if entry.get("body") else None
+            headers = {"content-type": entry["contentType"]} if entry.get("contentType") else {}
+            url = entry["path"] + (f"?{entry['query']}" if entry.get("query") else "")
+            start = time.perf_counter()
+            try:
+                response = await client.request(entry["method"], url, content=body, headers=headers)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 599
+            results.append((entry, status, (time.perf_counter() - start) * 1000, lag))
+
+    await asyncio.gather(*(one(entry) for entry in entries))
+    return results, time.perf_counter() - started
+
+
+def report(results: list, wall_seconds: float) -> dict:
+    by_route: dict[str, list] = {}
+    for entry, status, latency, lag in results:
+        by_route.setdefault(entry.get("route") or f"{entry['method']} {entry['path']}", []).append(
+            (entry, status, latency))
+    routes = {}
+    for route, rows in sorted(by_route.items()):
+        p50, p95, p99 = percentiles([latency for _, _, latency in rows])
+        captured = [entry["durationMs"] for entry, _, _ in rows if entry.get("durationMs") is not None]
+        routes[route] = {
+            "requests": len(rows),
+            # a status other than the captured one (e.g. 404 for data that is not there locally)
+            "errors": sum(status >= 500 or status != entry.get("status", status) for entry, status, _ in rows),
+            "p50": p50, "p95": p95, "p99": p99,
+            "capturedP50": round(statistics.median(captured), 2) if captured else None,
+        }
+    lags = [lag for *_, lag in results]
+    _, lag_p95, _ = percentiles(lags)
+    return {"requests": len(results), "wallSeconds": round(wall_seconds, 2),
+            "rps": round(len(results) / wall_seconds, 1) if wall_seconds else None,
+            "lagP95Ms": lag_p95, "lagMaxMs": round(max(lags), 2), "routes": routes}
+
+
+async def run(args) -> dict:
+    entries = load(args.traces, set(args.methods), args.limit)
+    if not entries:
+        raise SystemExit("no replayable requests in the trace")
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+            results, wall = await replay(client, entries, args.speedup, args.concurrency)
+    else:
+        import harness
+
+        harness.connect()
+        if args.seed:
+            await harness.seed(harness.api.mongo.get_database(), args.seed, args.days, args.log_entries)
+        transport = httpx.ASGITransport(app=harness.api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=60) as client:
+            results, wall = await replay(client, entries, args.speedup, args.concurrency)
+    return report(results, wall)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+")
+    parser.add_argument("--url", help="replay against a running server instead of the app in-process")
+    parser.add_argument("--speedup", type=float, default=1.0, help="divide the original spacing by this; 0 = no waiting")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--methods", type=lambda value: value.upper().split(","), default=["GET", "HEAD"])
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--seed", type=int, help="in-process: seed a synthetic roster of this size first")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--log-entries", type=int, default=20)
+    parser.add_argument("--json")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args))
+    print(f"requests={result['requests']} wall={result['wallSeconds']}s rps={result['rps']} "
+          f"lag_p95={result['lagP95Ms']}ms lag_max={result['lagMaxMs']}ms")
+    print(f"{'route':<48} {'n':>5} {'err':>4} {'p50':>9} {'p95':>9} {'p99':>9} {'captured':>9}")
+    for route, row in result["routes"].items():
+        print(f"{route:<48} {row['requests']:>5} {row['errors']:>4} {row['p50']:>9} {row['p95']:>9} "
+              f"{row['p99']:>9} {row['capturedP50'] if row['capturedP50'] is not None else '-':>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
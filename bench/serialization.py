@@ -0,0 +1,114 @@
+"""
+Response serialization for large `/api/users` and `getEmployeeByShift` payloads.
+
+"before" is the old path: rows built with validating constructors, then validated again
+against the response_model (or walked by jsonable_encoder) and rendered by JSONResponse.
+"after" is the app as it is: model_construct rows dumped straight to JSON bytes by a
+TypeAdapter. Both run in-process over ASGI with the DALs replaced by in-memory fakes,
+so only construction + serialization differ.
+
+    python bench/serialization.py --employees 2000 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+# one EMF line per request would drown the report
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import main as api  # noqa: E402
+from dal import EmployeeByShiftResponse, User  # noqa: E402
+
+USERS_PATH = "/api/users"
+SHIFT_PATH = "/api/jobdoc/2025-01-01/getEmployeeByShift/alpha"
+
+
+def make_docs(n: int):
+    users = [{"_id": f"{i:024x}", "employeeId": f"{i:04d}", "name": f"Employee {i}", "designation": "ATCO",
+              "email": f"employee{i}@example.com", "phone": f"98{i:08d}", "shift": "alpha"} for i in range(n)]
+    by_shift = [{"users": {"userid": u["employeeId"]},
+                 "userDetails": {k: u[k] for k in ("name", "designation", "email", "phone", "shift")}}
+                for u in users]
+    return users, by_shift
+
+
+class FakeUsersDAL:
+    def __init__(self, users):
+        self._users = [User.from_doc(u) for u in users]
+
+    async def get_user_list(self):
+        return self._users
+
+
+class FakeJobsDAL:
+    def __init__(self, by_shift):
+        self._by_shift = by_shift
+
+    async def get_active_users_id_by_shift(self, date_str, shift):
+        return self._by_shift
+
+
+def legacy_app(users, by_shift) -> FastAPI:
+    """The routes as they were."""
+    app = FastAPI()
+    # the roster cache keeps built users, so /api/users only paid for the response_model pass
+    user_list = [User(id=str(u["_id"]), **{k: v for k, v in u.items() if k != "_id"}) for u in users]
+
+    @app.get(USERS_PATH)
+    async def get_all_users() -> list[User]:
+        return user_list
+
+    @app.get("/api/jobdoc/{date_string}/getEmployeeByShift/{shift}")
+    async def get_employee_by_shift(date_string: str, shift: str):
+        return [EmployeeByShiftResponse(employeeId=doc["users"]["userid"], **doc["userDetails"]) for doc in by_shift]
+
+    return app
+
+
+def current_app(users, by_shift) -> FastAPI:
+    users_dal, jobs_dal = FakeUsersDAL(users), FakeJobsDAL(by_shift)
+    api.app.dependency_overrides[api.get_users_dal] = lambda: users_dal
+    api.app.dependency_overrides[api.get_jobs_dal] = lambda: jobs_dal
+    return api.app
+
+
+async def measure(app: FastAPI, path: str, requests: int) -> tuple[float, float, bytes]:
+    timings = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get(path)
+            timings.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+    return statistics.median(timings), statistics.quantiles(timings, n=20)[-1], response.content
+
+
+async def run(args):
+    users, by_shift = make_docs(args.employees)
+    before_app, after_app = legacy_app(users, by_shift), current_app(users, by_shift)
+    for label, path in (("/api/users", USERS_PATH), ("getEmployeeByShift", SHIFT_PATH)):
+        before_p50, before_p95, before_body = await measure(before_app, path, args.requests)
+        after_p50, after_p95, after_body = await measure(after_app, path, args.requests)
+        # same payload, byte for byte, bar whitespace
+        assert httpx.Response(200, content=before_body).json() == httpx.Response(200, content=after_body).json()
+        print(f"{label:<20} rows={args.employees:<6} bytes={len(after_body):<8,}"
+              f" before p50={before_p50:7.2f}ms p95={before_p95:7.2f}ms"
+              f"  after p50={after_p50:7.2f}ms p95={after_p95:7.2f}ms  x{before_p50 / after_p50:4.1f}")
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Bulk user import versus one POST /api/users per person, for a 5,000-row upload.
+
+"per-user" replays the old onboarding path (insert_one + a job-doc push per user);
+"bulk" runs the import route's steps: parse + batch-validate the CSV, one unordered
+bulk_write upsert, one $push/$each into today's job doc. Point MONGODB_URI at a scratch
+database (its bench collections are dropped); without it the run falls back to
+mongomock-motor, which scans the collection for every upsert, so its timings only
+confirm that the run works (use a few hundred rows there).
+
+    MONGODB_URI=mongodb://localhost:27017/bench python bench/user_import.py --rows 5000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from dal import JobsDAL, UserListDAL, UserRequest  # noqa: E402
+from user_import import USER_FIELDS, parse_rows, validate_rows  # noqa: E402
+
+USERS = "bench_users"
+JOBS = "bench_daily_jobs"
+DATE = "2025-01-01"
+
+
+def make_csv(rows: int) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(USER_FIELDS)
+    for i in range(rows):
+        writer.writerow([f"{i:05d}", f"Employee {i}", "ATCO", f"employee{i}@example.com", f"98{i:08d}",
+                         ["alpha", "bravo", "charlie", "delta", "echo"][i % 5]])
+    return out.getvalue().encode()
+
+
+def connect():
+    uri = os.environ.get("MONGODB_URI")
+    if uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(uri)
+        return client.get_default_database(), "mongod"
+    from mongomock_motor import AsyncMongoMockClient
+
+    return AsyncMongoMockClient()["bench"], "mongomock"
+
+
+async def reset(db):
+    await db.drop_collection(USERS)
+    await db.drop_collection(JOBS)
+    await db[USERS].create_index("employeeId", unique=True)
+    await db[JOBS].insert_one({"dateDocId": DATE, "users": [], "randomizerLog": []})
+
+
+async def per_user(db, data: bytes) -> int:
+    users_dal, jobs_dal = UserListDAL(db[USERS]), JobsDAL(db[JOBS], USERS)
+    rows = csv.DictReader(io.StringIO(data.decode()))
+    operations = 0
+    for row in rows:
+        user = UserRequest(**row)
+        await users_dal.create_user(user)
+        await jobs_dal.add_user_to_current_job_doc(DATE, user.employeeId)
+        operations += 2
+    return operations
+
+
+async def bulk(db, data: bytes) -> int:
+    users_dal, jobs_dal = UserListDAL(db[USERS]), JobsDAL(db[JOBS], USERS)
+    valid, _ = validate_rows(parse_rows(data, "csv"))
+    outcomes = await users_dal.bulk_upsert_users([user for _, user in valid])
+    created = [user.employeeId for (_, user), outcome in zip(valid, outcomes) if outcome["status"] == "created"]
+    await jobs_dal.add_users_to_job_docs(DATE, created)
+    return 2
+
+
+async def run(args):
+    db, backend = connect()
+    data = make_csv(args.rows)
+
+    start = time.perf_counter()
+    valid, invalid = validate_rows(parse_rows(data, "csv"))
+    parse_ms = (time.perf_counter() - start) * 1000
+    print(f"backend={backend} rows={args.rows} csv_bytes={len(data):,} parse+validate={parse_ms:.1f}ms"
+          f" valid={len(valid)} invalid={len(invalid)}")
+
+    for label, strategy in (("per-user", per_user), ("bulk", bulk)):
+        await reset(db)
+        start = time.perf_counter()
+        operations = await strategy(db, data)
+        elapsed = (time.perf_counter() - start) * 1000
+        job_doc = await db[JOBS].find_one({"dateDocId": DATE})
+        users = await db[USERS].count_documents({})
+        print(f"{label:<9} elapsed={elapsed:9.1f}ms  client_operations={operations:<6} users={users:<6}"
+              f" job_doc_users={len(job_doc['users'])}")
+        assert users == args.rows and len(job_doc["users"]) == args.rows
+
+    await db.drop_collection(USERS)
+    await db.drop_collection(JOBS)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the app modules import each other as top-level modules, as under uvicorn/Lambda
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
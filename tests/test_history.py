@@ -0,0 +1,32 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from history import SelectionHistoryDAL
+from indexes import INDEX_SPECS
+
+DATE = "2025-01-01"
+
+
+def log_item(main: list[str], standby: list[str], at: datetime) -> dict:
+    return {"triggerDateTime": at, "shift": "morning", "allotedTeam": "alpha",
+            "randomizerResult": {"mainList": [{"employeeId": e} for e in main],
+                                 "standbyList": [{"employeeId": e} for e in standby]}}
+
+
+def test_recording_a_run_twice_counts_it_once():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        await db["events"].create_indexes(INDEX_SPECS["selectionEvents"])
+        history = SelectionHistoryDAL(db["stats"], db["events"])
+        first = log_item(["1", "2"], ["3"], datetime(2025, 1, 1, 6))
+        await history.record(DATE, [first])
+        # a retry of the same run alongside a new one
+        await history.record(DATE, [first, log_item(["1"], [], datetime(2025, 1, 1, 7))])
+        assert await db["events"].count_documents({}) == 4
+        stats = await history.get_stats("1")
+        assert stats["mainSelections"] == 2 and stats["lastSelectedAt"] == datetime(2025, 1, 1, 7)
+        assert (await history.get_stats("3"))["standbySelections"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from cache import JobDocCache
+from dal import JobsDAL, ShiftDetail
+
+DATE = "2025-01-01"
+
+
+def job_doc(date_doc_id: str) -> dict:
+    return {"dateDocId": date_doc_id, "shiftDetail": {"morning": "alpha"}, "createdOn": datetime(2025, 1, 1),
+            "users": [{"userid": "1", "status": True}], "prevDocId": "", "randomizerLog": []}
+
+
+def test_writes_go_through_to_the_cached_doc():
+    async def run():
+        jobs = AsyncMongoMockClient()["test"]["jobs"]
+        await jobs.insert_one(job_doc(DATE))
+        cache = JobDocCache()
+        dal = JobsDAL(jobs, job_doc_cache=cache)
+        first = await dal.get_job_doc(DATE)
+        await dal.update_shift_details_in_jobdoc(DATE, ShiftDetail(morning="bravo", night="charlie"))
+        await dal.add_user_to_current_job_doc(DATE, "2")
+        cached = await dal.get_job_doc(DATE)
+        assert cached is first
+        assert cache.stats.hits == 1 and cache.stats.misses == 1
+        # the cached copy matches what a fresh read returns
+        assert cached == await JobsDAL(jobs).get_job_doc(DATE)
+        assert cached.shiftDetail.night == "charlie" and [user.userid for user in cached.users] == ["1", "2"]
+
+    asyncio.run(run())
+
+
+def test_a_load_that_raced_a_write_is_not_kept():
+    cache = JobDocCache()
+    generation = cache.generation
+    cache.apply(DATE, lambda job_doc: None)
+    cache.put(DATE, object(), generation)
+    assert cache.get(DATE) is None
+
+
+def test_least_recently_used_entry_is_dropped():
+    cache = JobDocCache(max_entries=2)
+    cache.put("2025-01-01", "a")
+    cache.put("2025-01-02", "b")
+    cache.get("2025-01-01")
+    cache.put("2025-01-03", "c")
+    assert cache.get("2025-01-02") is None
+    assert cache.get("2025-01-01") == "a" and cache.get("2025-01-03") == "c"
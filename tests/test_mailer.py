@@ -0,0 +1,51 @@
+import asyncio
+
+import mailer
+from mailer import MailDispatcher, TransientMailError
+
+
+class FakeTransport:
+    """Fails the first `transient_failures` calls per batch with a retryable error."""
+
+    def __init__(self, transient_failures: int = 0, fatal_for: str = ""):
+        self.transient_failures = transient_failures
+        self.fatal_for = fatal_for
+        self.calls: dict[str, int] = {}
+
+    def send_batch(self, emails: list[dict]) -> list[str]:
+        first = emails[0]["to"][0]
+        self.calls[first] = self.calls.get(first, 0) + 1
+        if first == self.fatal_for:
+            raise ValueError("invalid recipient")
+        if self.calls[first] <= self.transient_failures:
+            raise TransientMailError("429")
+        return [f"id-{email['to'][0]}" for email in emails]
+
+
+def dispatch(transport: FakeTransport, recipients: dict[str, list[str]], monkeypatch, **kwargs):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(mailer.asyncio, "sleep", sleep)
+    monkeypatch.setattr(mailer.random, "uniform", lambda low, high: high)
+    dispatcher = MailDispatcher(transport, batch_size=2, base_delay=1.0, max_delay=3.0, **kwargs)
+    return asyncio.run(dispatcher.dispatch(recipients)), delays
+
+
+def test_transient_failures_are_retried_with_exponential_backoff(monkeypatch):
+    result, delays = dispatch(FakeTransport(transient_failures=3), {"main": ["a", "b", "c"]}, monkeypatch)
+    assert result.status == "success" and result.sent == 3
+    assert [(batch.batch, batch.recipients, batch.attempts) for batch in result.batches] == [(0, 2, 4), (1, 1, 4)]
+    # 1s, 2s, then capped at max_delay, per batch
+    assert sorted(delays) == [1.0, 1.0, 2.0, 2.0, 3.0, 3.0]
+
+
+def test_batches_that_keep_failing_are_reported(monkeypatch):
+    transport = FakeTransport(transient_failures=9, fatal_for="x")
+    result, _ = dispatch(transport, {"main": ["a", "b"], "standby": ["x"]}, monkeypatch, max_attempts=2)
+    assert result.status == "failed" and result.failed == 3
+    assert [(batch.listType, batch.status, batch.attempts) for batch in result.batches] == [
+        ("main", "failed", 2), ("standby", "failed", 1)]
+    assert transport.calls == {"a": 2, "x": 1}
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+import metrics
+from metrics import CommandStatsListener, MetricsRegistry, RequestStats
+
+
+def test_reset_clears_routes_and_invocations():
+    registry = MetricsRegistry()
+    registry.record("GET /api/users", 200, RequestStats(), 12.0)
+    registry.cold_start_ms, registry.invocations = 850.0, {"cold": 1, "warm": 4}
+    registry.reset()
+    snapshot = registry.to_dict()
+    assert snapshot["routes"] == {} and snapshot["invocations"] == {"cold": 0, "warm": 0}
+    assert snapshot["coldStartMs"] is None
+
+
+def test_replies_are_only_sized_when_asked():
+    reply = SimpleNamespace(duration_micros=1500, reply={"ok": 1, "cursor": {"firstBatch": [{"a": 1}]}})
+    token = metrics._current.set(RequestStats())
+    try:
+        CommandStatsListener().succeeded(reply)
+        assert metrics._current.get().bytes_read == 0
+        CommandStatsListener(count_bytes=True).succeeded(reply)
+        stats = metrics._current.get()
+        assert stats.round_trips == 2 and stats.bytes_read > 0
+    finally:
+        metrics._current.reset(token)
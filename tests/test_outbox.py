@@ -0,0 +1,70 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dal import JobsDAL, RandomizerResponse1
+from outbox import OUTBOX_RANDOMIZER_LOG, OutboxDAL, OutboxWorker
+
+DATE = "2025-01-01"
+
+
+def make_worker(db, jobs_dal_factory):
+    outbox = OutboxDAL(db["outbox"], lease_seconds=0)
+    return outbox, OutboxWorker(outbox, jobs_dal_factory, mail_dispatcher=None)
+
+
+async def seed(db, outbox: OutboxDAL) -> list[dict]:
+    await db["jobs"].insert_one({"dateDocId": DATE, "users": [], "randomizerLog": []})
+    log_item = JobsDAL.build_randomizer_log_item(RandomizerResponse1(mainList=[], standbyList=[]), "alpha", "morning")
+    await outbox.enqueue(OUTBOX_RANDOMIZER_LOG, {"dateDocId": DATE, "logItem": log_item})
+    return await outbox.claim(10)
+
+
+def test_redelivered_randomizer_log_is_appended_once():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        outbox, worker = make_worker(db, lambda: JobsDAL(db["jobs"], "users"))
+        items = await seed(db, outbox)
+        # a retry after the lease expired, e.g. the first worker timed out before complete()
+        for _ in range(2):
+            done, failures = await worker._process(items)
+            assert done == [items[0]["_id"]] and failures == []
+        job_doc = await db["jobs"].find_one({"dateDocId": DATE})
+        assert len(job_doc["randomizerLog"]) == 1 and job_doc["deliveredOutboxIds"] == [str(items[0]["_id"])]
+
+    asyncio.run(run())
+
+
+def test_redelivery_after_the_log_cap_dropped_the_entry_is_skipped():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        jobs_dal = JobsDAL(db["jobs"], "users", randomizer_log_cap=1)
+        outbox, worker = make_worker(db, lambda: jobs_dal)
+        items = await seed(db, outbox)
+        await worker._process(items)
+        # a later run pushes the delivered entry out of the capped log
+        later = JobsDAL.build_randomizer_log_item(RandomizerResponse1(mainList=[], standbyList=[]), "bravo", "night")
+        await jobs_dal.append_randomizer_logs(DATE, [later])
+        await worker._process(items)
+        job_doc = await db["jobs"].find_one({"dateDocId": DATE})
+        assert [entry["allotedTeam"] for entry in job_doc["randomizerLog"]] == ["bravo"]
+
+    asyncio.run(run())
+
+
+def test_expired_lease_cannot_complete_a_reclaimed_item():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        outbox, _ = make_worker(db, None)
+        first = await seed(db, outbox)
+        # the lease (0s) expired and another worker claimed the item
+        await asyncio.sleep(0.01)
+        second = await outbox.claim(10)
+        assert second and second[0]["claimId"] != first[0]["claimId"]
+        await outbox.complete([first[0]["_id"]], first[0]["claimId"])
+        assert (await db["outbox"].find_one({}))["status"] == "processing"
+        await outbox.complete([second[0]["_id"]], second[0]["claimId"])
+        assert (await db["outbox"].find_one({}))["status"] == "done"
+        assert await outbox.last_completed() == (await db["outbox"].find_one({}))["completedOn"]
+
+    asyncio.run(run())
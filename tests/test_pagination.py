@@ -0,0 +1,55 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dal import JobsDAL, UserListDAL
+
+DATE = "2025-01-01"
+
+
+async def collect(iterator) -> list[dict]:
+    return [doc async for doc in iterator]
+
+
+async def seed(db):
+    await db["users"].insert_many([
+        {"employeeId": f"{i:02d}", "name": f"n{i}", "designation": "ATCO", "email": f"{i}@example.com",
+         "phone": "9800000000", "shift": "alpha" if i % 2 else "bravo"}
+        for i in (5, 3, 1, 4, 2, 6, 7)])
+    await db["jobs"].insert_one({"dateDocId": DATE, "shiftDetail": {}, "createdOn": datetime(2025, 1, 1),
+                                 "prevDocId": "", "randomizerLog": [],
+                                 "users": [{"userid": f"{i:02d}", "status": i != 3} for i in range(7, 0, -1)]})
+
+
+def test_users_page_by_employee_id():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        await seed(db)
+        dal = UserListDAL(db["users"])
+        pages, after = [], None
+        while True:
+            page = await collect(dal.iter_users(fields=["name"], after=after, limit=3))
+            if not page:
+                break
+            pages.append([doc["employeeId"] for doc in page])
+            after = page[-1]["employeeId"]
+        assert pages == [["01", "02", "03"], ["04", "05", "06"], ["07"]]
+        # only the requested fields (plus employeeId) are fetched
+        assert page == [] and (await collect(dal.iter_users(fields=["name"], limit=1))) == [
+            {"employeeId": "01", "name": "n1"}]
+
+    asyncio.run(run())
+
+
+def test_active_users_of_a_shift_page_by_employee_id():
+    async def run():
+        db = AsyncMongoMockClient()["test"]
+        await seed(db)
+        dal = JobsDAL(db["jobs"], "users")
+        first = await collect(dal.iter_active_users_by_shift(DATE, "alpha", fields=["email"], limit=2))
+        assert first == [{"employeeId": "01", "email": "1@example.com"}, {"employeeId": "05", "email": "5@example.com"}]
+        rest = await collect(dal.iter_active_users_by_shift(DATE, "alpha", after="05", limit=2))
+        assert [doc["employeeId"] for doc in rest] == ["07"]
+
+    asyncio.run(run())
@@ -0,0 +1,15 @@
+import json
+
+from randomizer import RandomizerEngine, replay
+
+
+def test_seed_round_trips_through_a_javascript_number():
+    engine = RandomizerEngine()
+    candidates = [{"employeeId": f"{i:03d}"} for i in range(40)]
+    for _ in range(50):
+        draw = engine.draw(candidates, "morning", key=lambda row: row["employeeId"])
+        assert draw.seed < 2 ** 53
+        # what a browser does to the number: parse it as a float64
+        seed = int(float(json.loads(json.dumps(draw.seed))))
+        assert replay(draw.sampling, seed) == ([row["employeeId"] for row in draw.main],
+                                               [row["employeeId"] for row in draw.standby])
@@ -0,0 +1,30 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dal import JobsDAL
+
+
+def run_entry(team: str, main: list[str], standby: list[str]) -> dict:
+    return {"shift": "morning", "allotedTeam": team,
+            "randomizerResult": {"mainList": [{"employeeId": e} for e in main],
+                                 "standbyList": [{"employeeId": e} for e in standby]}}
+
+
+def test_summary_counts_runs_days_selections_and_distinct_employees():
+    async def run():
+        jobs = AsyncMongoMockClient()["test"]["jobs"]
+        await jobs.insert_many([
+            {"dateDocId": "2025-01-01", "randomizerLog": [run_entry("alpha", ["1", "2"], ["3"]),
+                                                          run_entry("alpha", ["1"], [])]},
+            {"dateDocId": "2025-01-02", "randomizerLog": [run_entry("alpha", ["2", "4"], ["1"]),
+                                                          run_entry("bravo", ["9"], [])]},
+            {"dateDocId": "2025-01-03", "randomizerLog": [run_entry("bravo", ["8"], ["7"])]},
+        ])
+        summary = await JobsDAL(jobs).get_randomizer_summary("2025-01-01", "2025-01-02")
+        assert [(row["team"], row["category"], row["runs"], row["days"], row["selections"], row["distinctEmployees"])
+                for row in summary] == [("alpha", "Main", 3, 2, 5, 3), ("alpha", "Standby", 3, 2, 2, 2),
+                                        ("bravo", "Main", 1, 1, 1, 1), ("bravo", "Standby", 1, 1, 0, 0)]
+        assert await JobsDAL(jobs).get_randomizer_summary("2024-01-01", "2024-01-31") == []
+
+    asyncio.run(run())
@@ -0,0 +1,23 @@
+import asyncio
+import io
+
+from openpyxl import load_workbook
+
+import report
+from report import REPORT_COLUMNS, stream_xlsx
+
+
+async def aiter_rows(count: int):
+    for n in range(count):
+        yield [f"2025-01-01 06:{n:02d}:00", "alpha", "Main", str(n), "n", "ATCO", "e", "9800000000", "alpha"]
+
+
+def test_xlsx_has_every_row_across_chunks(monkeypatch):
+    monkeypatch.setattr(report, "ROWS_PER_CHUNK", 4)
+
+    async def run():
+        return b"".join([chunk async for chunk in stream_xlsx(aiter_rows(10))])
+
+    sheet = load_workbook(io.BytesIO(asyncio.run(run())), read_only=True)["sheet1"]
+    rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+    assert rows[0] == REPORT_COLUMNS and [row[3] for row in rows[1:]] == [str(n) for n in range(10)]
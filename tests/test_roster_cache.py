@@ -0,0 +1,44 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from cache import RosterCache
+from dal import UserListDAL
+
+
+def user_doc(employee_id: str, shift: str) -> dict:
+    return {"employeeId": employee_id, "name": employee_id, "designation": "ATCO",
+            "email": f"{employee_id}@example.com", "phone": "9800000000", "shift": shift}
+
+
+def test_roster_is_read_once_until_invalidated():
+    async def run():
+        users = AsyncMongoMockClient()["test"]["users"]
+        await users.insert_many([user_doc("1", "alpha"), user_doc("2", "bravo")])
+        cache = RosterCache()
+        dal = UserListDAL(users, cache)
+        assert [user.employeeId for user in await dal.get_users_by_shift("alpha")] == ["1"]
+        await users.insert_one(user_doc("3", "alpha"))
+        # served from the snapshot, the direct insert is not seen yet
+        assert await dal.get_employee_ids() == ["1", "2"]
+        dal.invalidate_roster_cache()
+        assert await dal.get_employee_ids() == ["1", "2", "3"]
+        assert cache.to_dict() | {"hitRatio": None} == {"hits": 1, "misses": 2, "invalidations": 1,
+                                                         "hitRatio": None, "version": 1, "size": 3,
+                                                         "ttlSeconds": None}
+
+    asyncio.run(run())
+
+
+def test_a_load_that_raced_an_invalidation_is_not_kept():
+    cache = RosterCache()
+    version = cache.version
+    cache.invalidate()
+    snapshot = cache.fill([], version)
+    assert snapshot.users == [] and cache.get() is None
+
+
+def test_snapshot_expires_after_the_ttl():
+    cache = RosterCache(ttl_seconds=0)
+    cache.fill([], cache.version)
+    assert cache.get() is None
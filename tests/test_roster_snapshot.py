@@ -0,0 +1,82 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from mongomock_motor import AsyncMongoMockClient
+
+from dal import JobsDAL, UserRequest
+
+DAY = datetime(2025, 1, 2)
+DATE = "2025-01-02"
+
+ROSTER = [UserRequest(employeeId=employee_id, name=f"n{employee_id}", designation="ATCO",
+                      email=f"{employee_id}@example.com", phone="9800000000", shift=team)
+          for employee_id, team in [("3", "alpha"), ("1", "bravo"), ("2", "alpha"), ("4", "alpha")]]
+
+
+async def seed(embed_roster: bool) -> JobsDAL:
+    db = AsyncMongoMockClient()["test"]
+    await db["users"].insert_many([user.model_dump() for user in ROSTER])
+    dal = JobsDAL(db["jobs"], "users", embed_roster=embed_roster)
+    await dal.create_job_docs([DAY], [user.employeeId for user in ROSTER], roster=ROSTER)
+    await db["jobs"].update_one({"dateDocId": DATE, "users.userid": "4"}, {"$set": {"users.$.status": False}})
+    return dal
+
+
+def test_new_job_docs_carry_the_roster_grouped_by_shift():
+    async def run():
+        dal = await seed(embed_roster=True)
+        doc = await dal._jobs_collection.find_one({"dateDocId": DATE})
+        assert doc["rosterSnapshot"] is True
+        assert [(user["shift"], user["userid"]) for user in doc["users"]] == [
+            ("alpha", "2"), ("alpha", "3"), ("alpha", "4"), ("bravo", "1")]
+        assert doc["users"][0] == {"userid": "2", "status": True, "name": "n2", "designation": "ATCO",
+                                   "email": "2@example.com", "phone": "9800000000", "shift": "alpha"}
+
+    asyncio.run(run())
+
+
+def by_id(rows: list[dict]) -> list[dict]:
+    return sorted(rows, key=lambda row: row["users"]["userid"])
+
+
+def test_snapshot_reads_match_the_lookup_reads():
+    async def run():
+        embedded, joined = await seed(embed_roster=True), await seed(embed_roster=False)
+        # 2025-01-02: alpha works the morning shift
+        roster = await embedded.get_shift_roster(DATE, "morning")
+        assert roster["allottedTeam"] == "alpha" and [row["users"]["userid"] for row in roster["roster"]] == ["2", "3"]
+        # the $lookup rows come in stored order, the snapshot rows in employeeId order
+        assert roster["roster"] == by_id((await joined.get_shift_roster(DATE, "morning"))["roster"])
+        assert await embedded.get_active_users_id_by_shift(DATE, "alpha") == \
+            by_id(await joined.get_active_users_id_by_shift(DATE, "alpha"))
+
+    asyncio.run(run())
+
+
+class CapturingCollection:
+    def __init__(self):
+        self.requests = []
+
+    async def bulk_write(self, requests, session=None):
+        self.requests.extend(requests)
+        return SimpleNamespace(modified_count=2)
+
+
+def test_user_edits_are_copied_into_today_and_later_docs():
+    async def run():
+        jobs = CapturingCollection()
+        dal = JobsDAL(jobs, embed_roster=True)
+        # mongomock has no arrayFilters, so check the bulk write itself
+        assert await dal.refresh_roster_snapshots(DATE, {"1": {"shift": "alpha"}, "2": {"shift": "alpha"},
+                                                         "3": {"email": "x@example.com", "status": False}}) == 2
+        update, regroup = (request._doc for request in jobs.requests)
+        assert [request._filter for request in jobs.requests] == [{"dateDocId": {"$gte": DATE},
+                                                                   "rosterSnapshot": True}] * 2
+        assert update == {"$set": {"users.$[u0].shift": "alpha", "users.$[u1].email": "x@example.com"}}
+        assert jobs.requests[0]._array_filters == [{"u0.userid": {"$in": ["1", "2"]}},
+                                                   {"u1.userid": {"$in": ["3"]}}]
+        assert regroup == {"$push": {"users": {"$each": [], "$sort": {"shift": 1, "userid": 1}}}}
+        assert await JobsDAL(jobs).refresh_roster_snapshots(DATE, {"1": {"shift": "alpha"}}) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from dal import ShiftDetail
+from rotation import DEFAULT_ROTATION, DEFAULT_ROTATION_CONFIG, RotationEngine, load_rotation
+
+CONFIG = {
+    "epoch": "2025-01-01",
+    "cycles": {"morning": ["a", "b", "c"], "night": ["c", "a"]},
+    "weekdayTeams": {"general": "g"},
+    "holidays": ["2025-01-08"],
+    "overrides": {"2025-01-02": {"morning": "z", "general": None}},
+}
+
+
+def test_cycles_weekdays_holidays_and_overrides():
+    rotation = RotationEngine.from_config(CONFIG)
+    # 2025-01-01 is a Wednesday
+    assert rotation.teams_on(date(2025, 1, 1)) == {"morning": "a", "night": "c", "general": "g"}
+    assert rotation.teams_on(datetime(2025, 1, 2, 23)) == {"morning": "z", "night": "a", "general": None}
+    assert rotation.teams_on(date(2025, 1, 4)) == {"morning": "a", "night": "a", "general": None}
+    assert rotation.teams_on(date(2025, 1, 8))["general"] is None
+    # a full period (lcm 6) later the cycles repeat
+    assert rotation.teams_on(date(2024, 12, 26)) == rotation.teams_on(date(2025, 1, 1))
+
+
+def test_teams_between_matches_teams_on():
+    rotation = RotationEngine.from_config(CONFIG)
+    start = date(2024, 12, 20)
+    days = rotation.teams_between(start, start + timedelta(days=40))
+    assert [day for day, _ in days] == [start + timedelta(days=n) for n in range(41)]
+    assert all(teams == rotation.teams_on(day) for day, teams in days)
+    assert rotation.teams_between(start, start - timedelta(days=1)) == []
+
+
+def test_team_calendar_lists_days_and_shifts():
+    calendar = DEFAULT_ROTATION.team_calendar(date(2025, 1, 1), date(2025, 1, 2))
+    assert calendar["alpha"] == [(date(2025, 1, 2), "morning")]
+    assert calendar["general"] == [(date(2025, 1, 1), "general"), (date(2025, 1, 2), "general")]
+
+
+def test_override_of_an_unknown_shift_is_rejected():
+    with pytest.raises(ValueError, match="evening"):
+        RotationEngine.from_config({**CONFIG, "overrides": {"2025-01-02": {"evening": "a"}}})
+
+
+@pytest.mark.parametrize("config", [
+    {**DEFAULT_ROTATION_CONFIG, "cycles": {**DEFAULT_ROTATION_CONFIG["cycles"], "evening": ["alpha"]}},
+    {**DEFAULT_ROTATION_CONFIG, "weekdayTeams": {"office": "general"}},
+])
+def test_shift_names_job_docs_cannot_hold_are_rejected_at_load(config, tmp_path):
+    path = tmp_path / "rotation.json"
+    path.write_text(json.dumps(config))
+    with pytest.raises(ValueError, match="unknown shift"):
+        load_rotation(str(path), shifts=ShiftDetail.model_fields)
+    assert RotationEngine.from_config(DEFAULT_ROTATION_CONFIG, shifts=ShiftDetail.model_fields).shifts == \
+        list(ShiftDetail.model_fields)
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from cache import SingleFlight
+
+
+def test_concurrent_identical_reads_run_once():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"rows": 3}
+
+        results = await asyncio.gather(*(flight.do(("roster", "2025-01-01", "morning"), load) for _ in range(5)),
+                                       flight.do(("roster", "2025-01-01", "night"), load))
+        assert len(calls) == 2 and results[0] is results[4]
+        # nothing is kept once the query finished
+        await flight.do(("roster", "2025-01-01", "morning"), load)
+        assert len(calls) == 3
+        assert flight.to_dict() == {"roster": {"calls": 7, "executions": 3, "coalesced": 4}}
+
+    asyncio.run(run())
+
+
+def test_followers_get_the_leaders_exception():
+    async def run():
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(flight.do(("job_doc", "d"), load) for _ in range(3)), return_exceptions=True)
+        assert [type(result) for result in results] == [RuntimeError] * 3
+        assert flight.to_dict()["job_doc"]["executions"] == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_leader_does_not_fail_its_followers():
+    async def run():
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def load():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        leader = asyncio.create_task(flight.do(("job_doc", "d"), load))
+        await started.wait()
+        follower = asyncio.create_task(flight.do(("job_doc", "d"), load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(run())
@@ -0,0 +1,20 @@
+from user_import import parse_rows, validate_rows
+
+HEADER = "employeeId,name,designation,email,phone,shift\n"
+
+
+def test_blank_cells_make_the_row_invalid():
+    data = (HEADER + "1,Asha,ATCO,asha@example.com,9800000001,alpha\n"
+                     ",bad,d,,1,x\n"
+                     "3,  ,ATCO,c@example.com,9800000003,bravo\n").encode()
+    valid, invalid = validate_rows(parse_rows(data, "csv"))
+    assert [(row, user.employeeId) for row, user in valid] == [(1, "1")]
+    assert [(result.row, result.status) for result in invalid] == [(2, "invalid"), (3, "invalid")]
+    assert "employeeId" in invalid[0].error and "email" in invalid[0].error
+    assert "name" in invalid[1].error
+
+
+def test_blank_json_values_make_the_row_invalid():
+    data = b'[{"employeeId": "", "name": "x", "designation": "d", "email": "e", "phone": "1", "shift": "alpha"}]'
+    valid, invalid = validate_rows(parse_rows(data, "json"))
+    assert valid == [] and invalid[0].status == "invalid"